@@ -1,9 +1,72 @@
 #!/usr/bin/python3
 
+import os
 import sys
+import mmap
+import itertools
+from array import array
 from argparse import ArgumentParser
+from collections import defaultdict
 
-def examine(sequence, collection_type=set, max_attempts=128000):
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ENGINE_LOOP = 'loop'
+ENGINE_CYCLE = 'cycle'
+ENGINE_NUMPY = 'numpy'
+ENGINES = (ENGINE_LOOP, ENGINE_CYCLE, ENGINE_NUMPY)
+_BLOCK_SIZE = 1 << 20
+
+def parse_changes(blocks, changes=None):
+    """Parses whitespace-separated signed integers from byte blocks into an array('q').
+    
+    Tokens may straddle block boundaries. If changes is given, it is cleared and
+    refilled so that its buffer can be reused across inputs.
+    """
+    if changes is None:
+        changes = array('q')
+    else:
+        del changes[:]
+    remainder = b''
+    for block in blocks:
+        if remainder:
+            block = remainder + block
+        tokens = block.split()
+        remainder = tokens.pop() if tokens and not block[-1:].isspace() else b''
+        changes.extend(map(int, tokens))
+    if remainder:
+        changes.append(int(remainder))
+    return changes
+
+def _read_blocks(ifile, block_size):
+    while True:
+        block = ifile.read(block_size)
+        if not block:
+            break
+        yield block
+
+def _mapped_blocks(mapped, block_size):
+    for offset in range(0, len(mapped), block_size):
+        yield mapped[offset:offset + block_size]
+
+def read_changes(pathname, changes=None, block_size=_BLOCK_SIZE):
+    """Reads frequency changes from a file, memory-mapping it if possible; '-' means stdin."""
+    if pathname in ('-', '/dev/stdin'):
+        return parse_changes(_read_blocks(sys.stdin.buffer, block_size), changes)
+    with open(pathname, 'rb') as ifile:
+        try:
+            size = os.fstat(ifile.fileno()).st_size
+            mapped = mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else None
+        except (OSError, ValueError):
+            return parse_changes(_read_blocks(ifile, block_size), changes)
+        if mapped is None:
+            return parse_changes((), changes)
+        with mapped:
+            return parse_changes(_mapped_blocks(mapped, block_size), changes)
+
+def _scan(sequence, collection_type, max_attempts):
     already_seen = collection_type()
     sum_ = 0
     num_attempts = 0
@@ -11,22 +74,95 @@ def examine(sequence, collection_type=set, max_attempts=128000):
         for number in sequence:
             sum_ += number
             if sum_ in already_seen:
-                return sum_ 
+                return sum_, num_attempts + 1
             already_seen.add(sum_)
         num_attempts += 1
     return None
 
+def find_first_repeat(sequence, collection_type=set, max_attempts=128000):
+    """Returns a (sum, passes) tuple for the first repeated partial sum, or None.
+    
+    After one pass, every later partial sum is a first-pass sum plus a multiple
+    of the net drift, so sums can only collide with sums in the same residue
+    class modulo the drift. Sorting each class by quotient makes the earliest
+    collision one of the adjacent pairs. Zero-drift inputs fall back to the
+    repeated-pass scan, which is bounded by max_attempts.
+    """
+    partial_sums = list(itertools.accumulate(sequence))
+    if not partial_sums:
+        return None
+    drift = partial_sums[-1]
+    if drift == 0:
+        return _scan(sequence, collection_type, max_attempts)
+    already_seen = set()
+    for sum_ in partial_sums:
+        if sum_ in already_seen:
+            return sum_, 1
+        already_seen.add(sum_)
+    del already_seen
+    groups = defaultdict(list)
+    for index, sum_ in enumerate(partial_sums):
+        groups[sum_ % drift].append((sum_ // drift, index))
+    n = len(partial_sums)
+    best = None
+    for members in groups.values():
+        members.sort()
+        for (quotient, index), (next_quotient, next_index) in zip(members, members[1:]):
+            passes = next_quotient - quotient
+            when = passes * n + index
+            if best is None or when < best[0]:
+                best = when, partial_sums[next_index], passes + 1
+    if best is None:
+        return None
+    return best[1], best[2]
+
+def find_first_repeat_numpy(sequence, collection_type=set, max_attempts=128000):
+    """Vectorized equivalent of find_first_repeat; requires numpy."""
+    if numpy is None:
+        raise RuntimeError("numpy engine requested but numpy is not installed")
+    partial_sums = numpy.cumsum(numpy.asarray(sequence, dtype=numpy.int64))
+    n = len(partial_sums)
+    if n == 0:
+        return None
+    drift = int(partial_sums[-1])
+    if drift == 0:
+        return _scan(sequence, collection_type, max_attempts)
+    # repeats within the first pass: the earliest is the second member of some run of equal sums
+    order = numpy.argsort(partial_sums, kind='stable')
+    same = partial_sums[order[1:]] == partial_sums[order[:-1]]
+    if same.any():
+        index = int(order[1:][same].min())
+        return int(partial_sums[index]), 1
+    # repeats in later passes: adjacent members of a residue class, ordered by quotient
+    residues = partial_sums % drift
+    quotients = partial_sums // drift
+    order = numpy.lexsort((quotients, residues))
+    same = residues[order[1:]] == residues[order[:-1]]
+    if not same.any():
+        return None
+    earlier, later = order[:-1][same], order[1:][same]
+    passes = quotients[later] - quotients[earlier]
+    best = numpy.argmin(passes * n + earlier)
+    return int(partial_sums[later[best]]), int(passes[best]) + 1
+
+def examine(sequence, collection_type=set, max_attempts=128000, engine=ENGINE_LOOP):
+    if engine == ENGINE_CYCLE:
+        found = find_first_repeat(sequence, collection_type, max_attempts)
+    elif engine == ENGINE_NUMPY:
+        found = find_first_repeat_numpy(sequence, collection_type, max_attempts)
+    elif engine == ENGINE_LOOP:
+        found = _scan(sequence, collection_type, max_attempts)
+    else:
+        raise ValueError("unknown engine: {}".format(engine))
+    return None if found is None else found[0]
+
 def main():
     parser = ArgumentParser()
     parser.add_argument("input_file", default="/dev/stdin")
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE_LOOP)
     args = parser.parse_args()
-    if args.input_file == '-':
-        args.input_file = "/dev/stdin"
-    with open(args.input_file, 'r') as ifile:
-        sequence = [line.strip() for line in ifile]
-    sequence = map(lambda line: line.lstrip('+'), sequence)
-    sequence = map(int, sequence)
-    found = examine(list(sequence))
+    sequence = read_changes(args.input_file)
+    found = examine(sequence, engine=args.engine)
     if found is not None:
         print("duplicate:", found)
         return 0 
@@ -35,4 +171,4 @@ def main():
         return 2
 
 if __name__ == '__main__':
-    exit(main())
\ No newline at end of file
+    exit(main())
@@ -13,3 +13,65 @@ class TestFindDupes(unittest.TestCase):
     def test_examine4(self):
         dupe = finddupes.examine((7, 7, -2, -7, -4))
         self.assertEqual(14, dupe)
+
+
+class TestFindFirstRepeat(unittest.TestCase):
+
+    def test_examine_cycle(self):
+        self.assertEqual(5, finddupes.examine((-6, 3, 8, 5, -6), engine=finddupes.ENGINE_CYCLE))
+        self.assertEqual(14, finddupes.examine((7, 7, -2, -7, -4), engine=finddupes.ENGINE_CYCLE))
+
+    def test_passes(self):
+        self.assertEqual((5, 3), finddupes.find_first_repeat((-6, 3, 8, 5, -6)))
+        self.assertEqual((0, 1), finddupes.find_first_repeat((1, -1, 3, -3)))
+        self.assertEqual((1, 2), finddupes.find_first_repeat((1, -1)))
+        self.assertIsNone(finddupes.find_first_repeat(()))
+
+    def test_matches_loop(self):
+        import random
+        rng = random.Random(2018)
+        for trial in range(300):
+            sequence = [rng.randint(-20, 20) for _ in range(rng.randint(1, 12))]
+            with self.subTest(sequence=sequence):
+                expected = finddupes._scan(sequence, set, 10000)
+                actual = finddupes.find_first_repeat(sequence, max_attempts=10000)
+                self.assertEqual(expected, actual)
+
+
+@unittest.skipIf(finddupes.numpy is None, "numpy not installed")
+class TestFindFirstRepeatNumpy(unittest.TestCase):
+
+    def test_examine_numpy(self):
+        self.assertEqual(5, finddupes.examine((-6, 3, 8, 5, -6), engine=finddupes.ENGINE_NUMPY))
+        self.assertEqual(14, finddupes.examine((7, 7, -2, -7, -4), engine=finddupes.ENGINE_NUMPY))
+
+    def test_matches_loop(self):
+        import random
+        rng = random.Random(1225)
+        for trial in range(300):
+            sequence = [rng.randint(-20, 20) for _ in range(rng.randint(0, 12))]
+            with self.subTest(sequence=sequence):
+                expected = finddupes._scan(sequence, set, 10000)
+                actual = finddupes.find_first_repeat_numpy(sequence, max_attempts=10000)
+                self.assertEqual(expected, actual)
+
+
+class TestParseChanges(unittest.TestCase):
+
+    def test_straddling_blocks(self):
+        blocks = [b'+1\n-2', b'3\n+', b'4\n', b'-5']
+        changes = finddupes.parse_changes(blocks)
+        self.assertEqual([1, -23, 4, -5], changes.tolist())
+        self.assertEqual('q', changes.typecode)
+
+    def test_reuse(self):
+        changes = finddupes.parse_changes([b'+7\n+7\n'])
+        reused = finddupes.parse_changes([b'-1\n'], changes)
+        self.assertIs(changes, reused)
+        self.assertEqual([-1], reused.tolist())
+
+    def test_read_changes(self):
+        import os
+        pathname = os.path.join(os.path.dirname(__file__), 'sample3.txt')
+        changes = finddupes.read_changes(pathname, block_size=3)
+        self.assertEqual(5, finddupes.examine(changes))
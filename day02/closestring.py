@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 
+import sys
+import time
 import argparse
+from collections import defaultdict
+
+MODE_ALL_PAIRS = 'all-pairs'
+MODE_MASKED = 'masked'
 
 _ZERO_CHAR = 0
 
@@ -12,12 +18,108 @@ def compute_charwise_distances(a, b):
     assert len(a) == len(b)
     return [ord(a[i]) - ord(b[i]) for i in range(len(a))]
 
+def hamming_distance(a, b):
+    return len(list(filter(lambda x: x != 0, compute_charwise_distances(a, b))))
+
+def _partition(length, num_segments):
+    bounds = [round(i * length / num_segments) for i in range(num_segments + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+class HammingIndex(object):
+    """Index over a static corpus for queries within Hamming distance max_distance.
+
+    Sequences are split into max_distance + 1 segments. By the pigeonhole
+    principle, two equal-length sequences within max_distance of each other
+    agree exactly on at least one segment, so candidates are gathered from
+    per-segment hash buckets and verified with compute_charwise_distances.
+    """
+
+    def __init__(self, sequences, max_distance=1):
+        self.sequences = list(sequences)
+        self.max_distance = max_distance
+        self._segments = {}
+        self._buckets = {}
+        for index, s in enumerate(self.sequences):
+            length = len(s)
+            if length not in self._buckets:
+                self._segments[length] = _partition(length, max_distance + 1)
+                self._buckets[length] = [defaultdict(list) for _ in self._segments[length]]
+            for (start, end), bucket in zip(self._segments[length], self._buckets[length]):
+                bucket[s[start:end]].append(index)
+
+    def _check_distance(self, k):
+        if k is None:
+            return self.max_distance
+        if k > self.max_distance:
+            raise ValueError("index supports distances up to {}, not {}".format(self.max_distance, k))
+        return k
+
+    def within(self, query, k=None):
+        """Returns a list of (distance, sequence) tuples within distance k of query, nearest first."""
+        k = self._check_distance(k)
+        length = len(query)
+        candidates = set()
+        for (start, end), bucket in zip(self._segments.get(length, ()), self._buckets.get(length, ())):
+            candidates.update(bucket.get(query[start:end], ()))
+        matches = []
+        for index in sorted(candidates):
+            distance = hamming_distance(query, self.sequences[index])
+            if distance <= k:
+                matches.append((distance, index))
+        matches.sort()
+        return [(distance, self.sequences[index]) for distance, index in matches]
+
+    def nearest(self, query, limit=1):
+        return self.within(query)[:limit]
+
+    def pairs(self, k=None):
+        """Yields (a, b, distance) for each pair of indexed sequences within distance k, once per pair."""
+        k = self._check_distance(k)
+        for length, segments in self._segments.items():
+            for s, bucket in enumerate(self._buckets[length]):
+                earlier = segments[:s]
+                for members in bucket.values():
+                    for i in range(len(members)):
+                        a = self.sequences[members[i]]
+                        for j in range(i + 1, len(members)):
+                            b = self.sequences[members[j]]
+                            # count each pair only in the first segment the two agree on
+                            if any(a[start:end] == b[start:end] for start, end in earlier):
+                                continue
+                            distance = hamming_distance(a, b)
+                            if distance <= k:
+                                yield a, b, distance
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("input", default="/dev/stdin")
+    parser.add_argument("--mode", choices=(MODE_ALL_PAIRS, MODE_MASKED), default=MODE_ALL_PAIRS)
+    parser.add_argument("--max-distance", type=int, metavar="K", help="build a Hamming index and report pairs within distance K")
+    parser.add_argument("--query", action='append', default=[], help="with --max-distance, report indexed sequences near QUERY; may be repeated")
     args = parser.parse_args()
     with open(args.input, 'r') as ifile:
         sequences = [s.strip() for s in ifile]
+    if args.max_distance is not None:
+        start = time.perf_counter()
+        index = HammingIndex(sequences, args.max_distance)
+        print("index built in {:.3f} ms".format((time.perf_counter() - start) * 1000), file=sys.stderr)
+        if not args.query:
+            for a, b, distance in index.pairs():
+                print((a, b), distance)
+        for query in args.query:
+            start = time.perf_counter()
+            matches = index.within(query)
+            elapsed = time.perf_counter() - start
+            for distance, s in matches:
+                print(query, s, distance)
+            print("query {} answered in {:.3f} ms".format(query, elapsed * 1000), file=sys.stderr)
+        return 0
+    if args.mode == MODE_MASKED:
+        for pair in find_near_pairs(sequences):
+            print(pair)
+        return 0
     distances = find_distances(sequences)
     for k, ds in distances.items():
         if len(list(filter(lambda x: x != 0, ds))) == 1:
@@ -32,5 +134,26 @@ def find_distances(sequences):
             distances[(a, b)] = compute_charwise_distances(a, b)
     return distances
 
+def find_near_pairs(sequences):
+    """Yields (a, b) pairs of equal-length sequences that differ in exactly one position.
+    
+    For each position k, sequences are bucketed by their value with position k
+    masked out; members of a bucket that differ at k are exactly the pairs that
+    differ only at k. Each pair is yielded once, in input order.
+    """
+    by_length = defaultdict(list)
+    for s in sequences:
+        by_length[len(s)].append(s)
+    for length, group in by_length.items():
+        for k in range(length):
+            buckets = defaultdict(list)
+            for s in group:
+                buckets[s[:k] + s[k + 1:]].append(s)
+            for bucket in buckets.values():
+                for i in range(len(bucket)):
+                    for j in range(i + 1, len(bucket)):
+                        if bucket[i][k] != bucket[j][k]:
+                            yield bucket[i], bucket[j]
+
 if __name__ == '__main__':
     exit(main())
@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from array import array
 from collections import defaultdict
 
 
@@ -11,7 +14,7 @@ class RepeatCharPredicate(object):
         pass
     
     def count(self, sequence):
-        counts = defaultdict(lambda: 0)
+        counts = defaultdict(int)
         for ch in sequence:
             counts[ch] = counts[ch] + 1
         return counts
@@ -21,26 +24,95 @@ class RepeatCharPredicate(object):
         return ''.join(filter(lambda ch: counts[ch] == required_count, counts.keys()))
 
 
-def compute_checksum(sequences, counts):
-    checksum_factors = defaultdict(lambda: 0)
+def tally_counts(sequences, counts):
+    """Counts the sequences having some character that occurs exactly n times, for each n in counts.
+    
+    Each ASCII sequence is histogrammed once into a reusable byte-indexed array,
+    and every requested count is checked against that one histogram; other
+    sequences are counted by character with a dict. The sequences may be any
+    iterable, so lines can be streamed from a file.
+    """
+    counts = tuple(counts)
+    tallies = defaultdict(int)
+    histogram = array('L', bytes(128 * array('L').itemsize))
     predicate = RepeatCharPredicate()
-    for required_count in counts:
-        for sequence in sequences:
-            matches = predicate.evaluate(sequence, required_count)
-            checksum_factors[required_count] += (1 if matches else 0)
+    for sequence in sequences:
+        try:
+            data = sequence.encode('ascii')
+        except UnicodeEncodeError:
+            occurrences = set(predicate.count(sequence).values())
+        else:
+            for b in data:
+                histogram[b] += 1
+            occurrences = {histogram[b] for b in data}
+            for b in data:
+                histogram[b] = 0
+        for required_count in counts:
+            tallies[required_count] += (1 if required_count in occurrences else 0)
+    return tallies
+
+def multiply_tallies(tallies):
     checksum = 1
-    for factor in checksum_factors.values():
+    for factor in tallies.values():
         checksum *= factor
     return checksum
 
+def compute_checksum(sequences, counts):
+    return multiply_tallies(tally_counts(sequences, counts))
+
+def find_shards(pathname, num_shards):
+    """Splits a file into at most num_shards (start, end) byte ranges that begin and end on line boundaries."""
+    size = os.path.getsize(pathname)
+    bounds = [0]
+    with open(pathname, 'rb') as ifile:
+        for i in range(1, num_shards):
+            offset = size * i // num_shards
+            if offset == 0:
+                continue
+            ifile.seek(offset - 1)
+            ifile.readline()
+            offset = ifile.tell()
+            if bounds[-1] < offset < size:
+                bounds.append(offset)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+def _read_shard(ifile, start, end):
+    ifile.seek(start)
+    while ifile.tell() < end:
+        yield ifile.readline().decode().strip()
+
+def _tally_shard(pathname, start, end, counts):
+    with open(pathname, 'rb') as ifile:
+        return tally_counts(_read_shard(ifile, start, end), counts)
+
+def merge_tallies(shard_tallies):
+    merged = defaultdict(int)
+    for tallies in shard_tallies:
+        for required_count, tally in tallies.items():
+            merged[required_count] += tally
+    return merged
+
+def compute_checksum_parallel(pathname, counts, workers):
+    """Computes the checksum of a file by tallying line-aligned shards in a process pool."""
+    counts = tuple(counts)
+    shards = find_shards(pathname, workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_tally_shard, pathname, start, end, counts) for start, end in shards]
+        tallies = merge_tallies(future.result() for future in futures)
+    return multiply_tallies(tallies)
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("input", default="/dev/stdin")
-    parser.add_argument("--counts", nargs='+', default=(2, 3,))
+    parser.add_argument("--counts", nargs='+', type=int, default=(2, 3,))
+    parser.add_argument("--workers", type=int, metavar="N", help="tally line-aligned shards of the file in N processes")
     args = parser.parse_args()
-    with open(args.input, 'r') as ifile:
-        sequences = [s.strip() for s in ifile]
-    checksum = compute_checksum(sequences, args.counts)
+    if args.workers:
+        checksum = compute_checksum_parallel(args.input, args.counts, args.workers)
+    else:
+        with open(args.input, 'r') as ifile:
+            checksum = compute_checksum((s.strip() for s in ifile), args.counts)
     print(checksum)
     return 0
 
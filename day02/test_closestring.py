@@ -20,3 +20,49 @@ wvxyz""".split()
         # self.assertDictEqual(expected, distances)
         for k, ds in distances.items():
             print(k, ds)
+
+
+class TestFindNearPairs(unittest.TestCase):
+
+    def test_sample(self):
+        sequences = "abcde fghij klmno pqrst fguij axcye wvxyz".split()
+        self.assertEqual([('fghij', 'fguij')], list(closestring.find_near_pairs(sequences)))
+
+    def test_matches_find_distances(self):
+        sequences = "abc abd xbd aec zzz abz xyz".split()
+        expected = set()
+        for k, ds in closestring.find_distances(sequences).items():
+            if len(list(filter(lambda x: x != 0, ds))) == 1:
+                expected.add(k)
+        actual = list(closestring.find_near_pairs(sequences))
+        self.assertEqual(len(actual), len(set(actual)))
+        self.assertSetEqual(expected, set(actual))
+
+
+class TestHammingIndex(unittest.TestCase):
+
+    sequences = "abcde fghij klmno pqrst fguij axcye wvxyz abcdf".split()
+
+    def test_within(self):
+        index = closestring.HammingIndex(self.sequences, max_distance=2)
+        self.assertEqual([(0, 'abcde'), (1, 'abcdf'), (2, 'axcye')], index.within('abcde'))
+        self.assertEqual([(0, 'abcde'), (1, 'abcdf')], index.within('abcde', 1))
+        self.assertEqual([(1, 'fghij')], index.nearest('fghxj'))
+        self.assertEqual([], index.within('abc'))
+        with self.assertRaises(ValueError):
+            index.within('abcde', 3)
+
+    def test_pairs_match_brute_force(self):
+        import random
+        rng = random.Random(2)
+        sequences = [''.join(rng.choice('ab') for _ in range(6)) for _ in range(40)]
+        for k in (0, 1, 2, 3):
+            with self.subTest(k=k):
+                expected = []
+                for i in range(len(sequences)):
+                    for j in range(i + 1, len(sequences)):
+                        distance = closestring.hamming_distance(sequences[i], sequences[j])
+                        if distance <= k:
+                            expected.append((sequences[i], sequences[j], distance))
+                actual = list(closestring.HammingIndex(sequences, k).pairs())
+                self.assertEqual(sorted(expected), sorted(actual))
@@ -36,4 +36,62 @@ ababab
 """.split()
         sequences = [s.strip() for s in sequences]
         checksum = rudisum.compute_checksum(sequences, (2, 3,))
-        self.assertEqual(12, checksum)
\ No newline at end of file
+        self.assertEqual(12, checksum)
+
+class TestTallyCounts(unittest.TestCase):
+
+    def test_streaming(self):
+        ifile = io.StringIO("abcdef\nbababc\nabbcde\nabcccd\naabcdd\nabcdee\nababab\n")
+        tallies = rudisum.tally_counts((line.strip() for line in ifile), (2, 3, 4))
+        self.assertDictEqual({2: 4, 3: 3, 4: 0}, dict(tallies))
+
+    def test_matches_predicate(self):
+        p = RepeatCharPredicate()
+        sequences = ['', 'a', 'aa', 'abab', 'aaabbbcc', 'zzzzyx']
+        tallies = rudisum.tally_counts(sequences, (1, 2, 3, 4))
+        for required_count in (1, 2, 3, 4):
+            expected = sum(1 for s in sequences if p.evaluate(s, required_count))
+            self.assertEqual(expected, tallies[required_count])
+
+    def test_non_ascii(self):
+        p = RepeatCharPredicate()
+        sequences = ['éè', 'éé', 'aéa', 'ßßß']
+        tallies = rudisum.tally_counts(sequences, (1, 2, 3))
+        for required_count in (1, 2, 3):
+            expected = sum(1 for s in sequences if p.evaluate(s, required_count))
+            self.assertEqual(expected, tallies[required_count])
+
+
+class TestComputeChecksumParallel(unittest.TestCase):
+
+    def test_shards(self):
+        import os
+        pathname = os.path.join(os.path.dirname(__file__), 'input.txt')
+        with open(pathname, 'rb') as ifile:
+            content = ifile.read()
+        shards = rudisum.find_shards(pathname, 7)
+        self.assertEqual(0, shards[0][0])
+        self.assertEqual(len(content), shards[-1][1])
+        for (start, end), (next_start, _) in zip(shards, shards[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(b'\n', content[end - 1:end])
+
+    def test_matches_serial(self):
+        import os
+        pathname = os.path.join(os.path.dirname(__file__), 'input.txt')
+        with open(pathname, 'r') as ifile:
+            expected = rudisum.compute_checksum((s.strip() for s in ifile), (2, 3))
+        self.assertEqual(expected, rudisum.compute_checksum_parallel(pathname, (2, 3), 3))
+
+    def test_shards_small_file(self):
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as tempdir:
+            pathname = os.path.join(tempdir, 'small.txt')
+            with open(pathname, 'wb') as ofile:
+                ofile.write(b'ab\n')
+            self.assertListEqual([(0, 3)], rudisum.find_shards(pathname, 8))
+            self.assertEqual(0, rudisum.compute_checksum_parallel(pathname, (2, 3), 8))
+            empty = os.path.join(tempdir, 'empty.txt')
+            open(empty, 'wb').close()
+            self.assertListEqual([(0, 0)], rudisum.find_shards(empty, 2))
@@ -3,39 +3,48 @@
 import sys
 import re
 import logging
+import heapq
+import itertools
+import operator
+from array import array
 from collections import defaultdict
 import argparse
 
 
 _log = logging.getLogger(__name__)
 
+ENGINE_SQUARES = 'squares'
+ENGINE_GRID = 'grid'
+ENGINE_DIFFERENCE = 'difference'
+ENGINE_PAIRWISE = 'pairwise'
+ENGINE_SWEEP = 'sweep'
+
 
 class Square(tuple):
 
-    col = None
-    row = None
+    __slots__ = ()
+
+    col = property(operator.itemgetter(0))
+    row = property(operator.itemgetter(1))
 
     def __new__(cls, col, row):
-        thing = super(Square, cls).__new__(cls, tuple([col, row]))
-        thing.__setattr__('col', col)
-        thing.__setattr__('row', row)
-        return thing
+        return tuple.__new__(cls, (col, row))
+
+
+_CLAIM_PATTERN = re.compile(r'\s*#(?P<claim_id>\d+)\s+@\s+(?P<col>\d+),(?P<row>\d+):\s*(?P<width>\d+)x(?P<height>\d+)\s*')
 
 
 class Claim(tuple):
 
-    claim_id = None
-    corner = None
-    width = None
-    height = None
+    __slots__ = ()
+
+    corner = property(operator.itemgetter(0))
+    width = property(operator.itemgetter(1))
+    height = property(operator.itemgetter(2))
+    claim_id = property(operator.itemgetter(3))
 
     def __new__(cls, claim_id, corner, width, height):
-        claim = super(Claim, cls).__new__(cls, tuple([corner, width, height, claim_id]))
-        claim.__setattr__('claim_id', claim_id)
-        claim.__setattr__('corner', corner)
-        claim.__setattr__('width', width)
-        claim.__setattr__('height', height)
-        return claim
+        return tuple.__new__(cls, (corner, width, height, claim_id))
     
     def squares(self):
         squares = []
@@ -44,16 +53,17 @@ class Claim(tuple):
                 squares.append(Square(col, row))
         return tuple(squares)
     
+    def overlaps(self, other):
+        return (self.corner.col < other.corner.col + other.width and other.corner.col < self.corner.col + self.width
+                and self.corner.row < other.corner.row + other.height and other.corner.row < self.corner.row + self.height)
+
     def intersection(self, other, overlap_id=0):
-        mine = set(self.squares())
-        theirs = set(other.squares())
-        common = mine & theirs
-        if not common:
+        min_col, min_row = max(self.corner.col, other.corner.col), max(self.corner.row, other.corner.row)
+        max_col = min(self.corner.col + self.width, other.corner.col + other.width)
+        max_row = min(self.corner.row + self.height, other.corner.row + other.height)
+        width, height = max_col - min_col, max_row - min_row
+        if width <= 0 or height <= 0:
             return None
-        min_col, min_row = min([sq.col for sq in common]), min([sq.row for sq in common])
-        max_col, max_row = max([sq.col for sq in common]), max([sq.row for sq in common])
-        width, height = max_row - min_row + 1, max_col - min_col + 1
-        assert width > 0 and height > 0
         return Claim(overlap_id, Square(min_col, min_row), width, height)
     
     @classmethod
@@ -63,7 +73,7 @@ class Claim(tuple):
             #1 @ 1,3: 4x4
 
         """
-        m = re.fullmatch(r'\s*#(?P<claim_id>\d+)\s+@\s+(?P<col>\d+),(?P<row>\d+):\s*(?P<width>\d+)x(?P<height>\d+)\s*', token)
+        m = _CLAIM_PATTERN.fullmatch(token)
         if m is None:
             return None
         claim_id = int(m.group('claim_id'))
@@ -71,16 +81,157 @@ class Claim(tuple):
         width, height = int(m.group('width')), int(m.group('height'))
         return Claim(claim_id, corner, width, height)
 
+    @classmethod
+    def parse_many(cls, lines, table=None):
+        """Parses claims from lines into a ClaimTable, skipping lines that are not claims."""
+        table = ClaimTable() if table is None else table
+        fullmatch = _CLAIM_PATTERN.fullmatch
+        for line in lines:
+            m = fullmatch(line)
+            if m is not None:
+                claim_id, col, row, width, height = m.groups()
+                table.append(int(claim_id), int(col), int(row), int(width), int(height))
+        return table
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("part", choices=('1', '2'), help="part ('1' or '2')")
-    parser.add_argument("--log-level", choices=('DEBUG', 'INFO', 'WARN', 'ERROR'), default='INFO')
-    args = parser.parse_args()
-    logging.basicConfig(level=logging.__dict__[args.log_level])
-    _log.debug("reading from standard input")
-    claims = [Claim.parse(line) for line in sys.stdin]
-    if args.part == '1':
+
+class ClaimTable(object):
+    """Sequence of claims stored as array('i') columns; Claim objects are created on access."""
+
+    def __init__(self):
+        self.claim_ids = array('i')
+        self.cols = array('i')
+        self.rows = array('i')
+        self.widths = array('i')
+        self.heights = array('i')
+
+    def append(self, claim_id, col, row, width, height):
+        self.claim_ids.append(claim_id)
+        self.cols.append(col)
+        self.rows.append(row)
+        self.widths.append(width)
+        self.heights.append(height)
+
+    def __len__(self):
+        return len(self.claim_ids)
+
+    def __getitem__(self, i):
+        return Claim(self.claim_ids[i], Square(self.cols[i], self.rows[i]), self.widths[i], self.heights[i])
+
+    def __iter__(self):
+        for fields in zip(self.claim_ids, self.cols, self.rows, self.widths, self.heights):
+            yield Claim(fields[0], Square(fields[1], fields[2]), fields[3], fields[4])
+
+
+class ClaimGrid(object):
+    """Dense grid of per-square claim counts, stored row-major in an array('i')."""
+
+    def __init__(self, corner, width, height):
+        self.corner = corner
+        self.width = width
+        self.height = height
+        self.counts = array('i', [0]) * (width * height)
+        self.num_claimed = 0
+        self.num_multiclaimed = 0
+    
+    @classmethod
+    def covering(cls, claims):
+        """Creates a grid sized to the bounding box of the given claims."""
+        if not claims:
+            return ClaimGrid(Square(0, 0), 0, 0)
+        min_col = min([c.corner.col for c in claims])
+        min_row = min([c.corner.row for c in claims])
+        max_col = max([c.corner.col + c.width for c in claims])
+        max_row = max([c.corner.row + c.height for c in claims])
+        return ClaimGrid(Square(min_col, min_row), max_col - min_col, max_row - min_row)
+
+    def _offset(self, col, row):
+        return (row - self.corner.row) * self.width + (col - self.corner.col)
+
+    def contains(self, claim):
+        return (self.corner.col <= claim.corner.col and claim.corner.col + claim.width <= self.corner.col + self.width
+                and self.corner.row <= claim.corner.row and claim.corner.row + claim.height <= self.corner.row + self.height)
+
+    def expand(self, claim):
+        """Reallocates the grid so that it also covers the given claim, keeping existing counts.
+        
+        The grid grows to at least double its size in each direction it needs to
+        grow (but not past the sheet's top and left edges at zero), so that a
+        stream of claims causes few reallocations.
+        """
+        if self.width == 0 or self.height == 0:
+            min_col, min_row = claim.corner
+            max_col, max_row = min_col + claim.width, min_row + claim.height
+        else:
+            min_col, min_row = self.corner
+            max_col, max_row = min_col + self.width, min_row + self.height
+            if claim.corner.col < min_col:
+                min_col = min(claim.corner.col, max(0, min_col - self.width))
+            if claim.corner.row < min_row:
+                min_row = min(claim.corner.row, max(0, min_row - self.height))
+            if claim.corner.col + claim.width > max_col:
+                max_col = max(claim.corner.col + claim.width, self.corner.col + 2 * self.width)
+            if claim.corner.row + claim.height > max_row:
+                max_row = max(claim.corner.row + claim.height, self.corner.row + 2 * self.height)
+        _log.debug("expanding grid to %s x %s", max_col - min_col, max_row - min_row)
+        old_corner, old_width, old_counts = self.corner, self.width, self.counts
+        self.corner, self.width, self.height = Square(min_col, min_row), max_col - min_col, max_row - min_row
+        self.counts = array('i', [0]) * (self.width * self.height)
+        for row in range(len(old_counts) // old_width if old_width else 0):
+            start = self._offset(old_corner.col, old_corner.row + row)
+            self.counts[start:start + old_width] = old_counts[row * old_width:(row + 1) * old_width]
+
+    def add(self, claim):
+        """Adds one claim by incrementing each of its squares, keeping the claimed and multiclaimed tallies current."""
+        if not self.contains(claim):
+            self.expand(claim)
+        counts = self.counts
+        for row in range(claim.corner.row, claim.corner.row + claim.height):
+            start = self._offset(claim.corner.col, row)
+            for i in range(start, start + claim.width):
+                counts[i] += 1
+                if counts[i] == 1:
+                    self.num_claimed += 1
+                elif counts[i] == 2:
+                    self.num_multiclaimed += 1
+
+    def add_all(self, claims):
+        """Adds claims with a 2-D difference array, so each claim costs four updates regardless of its area."""
+        stride = self.width + 1
+        diff = array('i', [0]) * (stride * (self.height + 1))
+        for claim in claims:
+            col, row = claim.corner.col - self.corner.col, claim.corner.row - self.corner.row
+            top, bottom = row * stride, (row + claim.height) * stride
+            diff[top + col] += 1
+            diff[top + col + claim.width] -= 1
+            diff[bottom + col] -= 1
+            diff[bottom + col + claim.width] += 1
+        running = [0] * stride
+        for row in range(self.height):
+            running = list(map(operator.add, running, itertools.accumulate(diff[row * stride:(row + 1) * stride])))
+            start = row * self.width
+            self.counts[start:start + self.width] = array('i', map(operator.add, self.counts[start:start + self.width], running[:self.width]))
+        self.num_claimed = self.width * self.height - self.counts.count(0)
+        self.num_multiclaimed = self.num_claimed - self.counts.count(1)
+
+    def count_claimed(self):
+        return self.num_claimed
+
+    def count_multiclaimed(self):
+        return self.num_multiclaimed
+
+    def stream(self, lines):
+        """Parses and adds claims as lines arrive, yielding each claim with the overlap tallies after it."""
+        for line in lines:
+            claim = Claim.parse(line)
+            if claim is None:
+                continue
+            self.add(claim)
+            yield claim, self.num_multiclaimed, self.num_claimed
+
+
+def count_overlaps(claims, engine=ENGINE_SQUARES):
+    """Returns a tuple of the number of squares claimed more than once and the number claimed at all."""
+    if engine == ENGINE_SQUARES:
         counts = defaultdict(int)
         for claim in claims:
             squares = claim.squares()
@@ -90,7 +241,149 @@ def main():
         for sq, count in counts.items():
             if count > 1:
                 num_multiclaimed_squares += 1
-        print("{} of {} squares are contained in multiple claims".format(num_multiclaimed_squares, len(counts)))
+        return num_multiclaimed_squares, len(counts)
+    grid = ClaimGrid.covering(claims)
+    if engine == ENGINE_GRID:
+        for claim in claims:
+            grid.add(claim)
+    elif engine == ENGINE_DIFFERENCE:
+        grid.add_all(claims)
+    else:
+        raise ValueError("invalid engine")
+    return grid.count_multiclaimed(), grid.count_claimed()
+
+
+class RowIntervals(object):
+    """Set of half-open row intervals that reports the members overlapping a query interval.
+
+    Rows are compressed to the interval endpoints given up front. Each member is
+    stored in the O(log n) segment tree nodes that cover its rows, so members
+    containing a row are found on one leaf-to-root walk; a second tree keyed by
+    starting row finds the members that start inside the query interval.
+    """
+
+    def __init__(self, endpoints):
+        self.rows = sorted(set(endpoints))
+        self._index = {row: k for k, row in enumerate(self.rows)}
+        self.size = max(1, len(self.rows))
+        self.covering = [set() for _ in range(2 * self.size)]
+        self.starting = [set() for _ in range(2 * self.size)]
+        self.counts = array('i', [0]) * (2 * self.size)
+
+    def _cover(self, start, end, key, update):
+        lo, hi = self._index[start] + self.size, self._index[end] + self.size
+        while lo < hi:
+            if lo & 1:
+                update(self.covering[lo], key)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                update(self.covering[hi], key)
+            lo, hi = lo >> 1, hi >> 1
+
+    def _count(self, start, delta):
+        node = self._index[start] + self.size
+        while node >= 1:
+            self.counts[node] += delta
+            node >>= 1
+
+    def add(self, start, end, key):
+        self._cover(start, end, key, set.add)
+        self.starting[self._index[start] + self.size].add(key)
+        self._count(start, 1)
+
+    def discard(self, start, end, key):
+        self._cover(start, end, key, set.discard)
+        self.starting[self._index[start] + self.size].discard(key)
+        self._count(start, -1)
+
+    def _starting_within(self, lo, hi):
+        lo, hi = lo + self.size, hi + self.size
+        nodes = []
+        while lo < hi:
+            if lo & 1:
+                nodes.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                nodes.append(hi)
+            lo, hi = lo >> 1, hi >> 1
+        while nodes:
+            node = nodes.pop()
+            if self.counts[node] == 0:
+                continue
+            if node >= self.size:
+                yield from self.starting[node]
+            else:
+                nodes.append(2 * node)
+                nodes.append(2 * node + 1)
+
+    def overlapping(self, start, end):
+        """Yields the keys of members overlapping rows start to end (exclusive); both must be endpoints."""
+        node = self._index[start] + self.size
+        while node >= 1:
+            yield from self.covering[node]
+            node >>= 1
+        yield from self._starting_within(self._index[start] + 1, self._index[end])
+
+
+def find_conflicts(claims):
+    """Yields each pair of overlapping claims once.
+    
+    Claims are swept left to right by starting column. A heap ordered by ending
+    column retires claims that the sweep has passed, and the active claims are
+    kept in a RowIntervals structure, so each claim visits only the active claims
+    whose rows it overlaps.
+    """
+    ordered = sorted(range(len(claims)), key=lambda i: claims[i].corner.col)
+    retiring = []
+    active = RowIntervals(itertools.chain.from_iterable((c.corner.row, c.corner.row + c.height) for c in claims))
+    for i in ordered:
+        claim = claims[i]
+        top, bottom = claim.corner.row, claim.corner.row + claim.height
+        while retiring and retiring[0][0] <= claim.corner.col:
+            _, j = heapq.heappop(retiring)
+            active.discard(claims[j].corner.row, claims[j].corner.row + claims[j].height, j)
+        for j in active.overlapping(top, bottom):
+            yield (claims[j], claim) if j < i else (claim, claims[j])
+        active.add(top, bottom, i)
+        heapq.heappush(retiring, (claim.corner.col + claim.width, i))
+
+
+def find_unconflicted(claims, conflicts=None):
+    """Returns the claims that overlap no other claim, in input order."""
+    conflicted = set()
+    for a, b in (find_conflicts(claims) if conflicts is None else conflicts):
+        conflicted.add(a.claim_id)
+        conflicted.add(b.claim_id)
+    return [claim for claim in claims if claim.claim_id not in conflicted]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("part", choices=('1', '2'), help="part ('1' or '2')")
+    parser.add_argument("--engine", choices=(ENGINE_SQUARES, ENGINE_GRID, ENGINE_DIFFERENCE), default=ENGINE_SQUARES, help="part 1 counting engine")
+    parser.add_argument("--conflict-engine", choices=(ENGINE_PAIRWISE, ENGINE_SWEEP), default=ENGINE_PAIRWISE, help="part 2 conflict engine")
+    parser.add_argument("--stream", action='store_true', help="part 1: report overlap after each claim as input arrives")
+    parser.add_argument("--log-level", choices=('DEBUG', 'INFO', 'WARN', 'ERROR'), default='INFO')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.__dict__[args.log_level])
+    _log.debug("reading from standard input")
+    if args.part == '1' and args.stream:
+        for claim, num_multiclaimed_squares, num_claimed_squares in ClaimGrid(Square(0, 0), 0, 0).stream(sys.stdin):
+            print("#{}: {} of {} squares are contained in multiple claims".format(claim.claim_id, num_multiclaimed_squares, num_claimed_squares), flush=True)
+        return 0
+    claims = Claim.parse_many(sys.stdin)
+    if args.part == '1':
+        num_multiclaimed_squares, num_claimed_squares = count_overlaps(claims, args.engine)
+        print("{} of {} squares are contained in multiple claims".format(num_multiclaimed_squares, num_claimed_squares))
+    elif args.part == '2' and args.conflict_engine == ENGINE_SWEEP:
+        def log_conflicts(conflicts):
+            for a, b in conflicts:
+                _log.debug("{} intersects {}".format(a, b))
+                yield a, b
+        for claim in find_unconflicted(claims, log_conflicts(find_conflicts(claims))):
+            print("claim with no conflicts: {}".format(claim))
     elif args.part == '2':
         for i in range(len(claims)):
             a = claims[i]
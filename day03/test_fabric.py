@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 import unittest
-from fabric import Claim, Square
+import itertools
+import fabric
+from fabric import Claim, Square, ClaimGrid, ClaimTable
 
 class TestSquare(unittest.TestCase):
 
@@ -13,6 +15,14 @@ class TestSquare(unittest.TestCase):
         self.assertNotEqual(u, v) 
         self.assertNotEqual(v, w) 
 
+    def test_compact(self):
+        u = Square(2, 3)
+        col, row = u
+        self.assertEqual((2, 3), (col, row))
+        self.assertEqual((2, 3), (u.col, u.row))
+        self.assertEqual(hash((2, 3)), hash(u))
+        self.assertFalse(hasattr(u, '__dict__'))
+
 class TestClaim(unittest.TestCase):
 
     def test_parse(self):
@@ -40,3 +50,98 @@ class TestClaim(unittest.TestCase):
         actual = claim1.intersection(claim2, -1)
         self.assertIsNone(actual)
 
+    def test_intersection_rectangular(self):
+        claim1 = Claim(1, Square(0, 0), 6, 2)
+        claim2 = Claim(2, Square(2, 1), 2, 5)
+        self.assertEqual(Claim(0, Square(2, 1), 2, 1), claim1.intersection(claim2))
+        self.assertTrue(claim1.overlaps(claim2))
+        self.assertFalse(claim1.overlaps(Claim(3, Square(6, 0), 1, 1)))
+
+    def test_parse_many(self):
+        lines = ['#1 @ 1,3: 4x4\n', '\n', '#2 @ 3,1: 4x4\n', '#3 @ 5,5: 2x2']
+        table = Claim.parse_many(lines)
+        self.assertIsInstance(table, ClaimTable)
+        self.assertEqual(3, len(table))
+        self.assertEqual([Claim.parse(line) for line in lines if line.strip()], list(table))
+        self.assertEqual(Claim(2, Square(3, 1), 4, 4), table[1])
+        self.assertEqual('i', table.widths.typecode)
+        self.assertFalse(hasattr(table[0], '__dict__'))
+
+
+class TestClaimGrid(unittest.TestCase):
+
+    claims = [Claim.parse('#1 @ 1,3: 4x4'), Claim.parse('#2 @ 3,1: 4x4'), Claim.parse('#3 @ 5,5: 2x2')]
+
+    def test_covering(self):
+        grid = ClaimGrid.covering(self.claims)
+        self.assertEqual((Square(1, 1), 6, 6), (grid.corner, grid.width, grid.height))
+
+    def test_count_overlaps(self):
+        for engine in (fabric.ENGINE_SQUARES, fabric.ENGINE_GRID, fabric.ENGINE_DIFFERENCE):
+            with self.subTest(engine=engine):
+                self.assertEqual((4, 32), fabric.count_overlaps(self.claims, engine))
+
+    def test_add_all_matches_add(self):
+        import random
+        rng = random.Random(3)
+        claims = [Claim(i, Square(rng.randint(0, 20), rng.randint(0, 20)), rng.randint(1, 8), rng.randint(1, 8)) for i in range(30)]
+        expected, actual = ClaimGrid.covering(claims), ClaimGrid.covering(claims)
+        for claim in claims:
+            expected.add(claim)
+        actual.add_all(claims)
+        self.assertEqual(expected.counts, actual.counts)
+
+
+class TestFindConflicts(unittest.TestCase):
+
+    def test_sample(self):
+        claims = [Claim.parse('#1 @ 1,3: 4x4'), Claim.parse('#2 @ 3,1: 4x4'), Claim.parse('#3 @ 5,5: 2x2')]
+        self.assertEqual([(claims[0], claims[1])], list(fabric.find_conflicts(claims)))
+        self.assertEqual([claims[2]], fabric.find_unconflicted(claims))
+
+    def test_matches_pairwise(self):
+        import random
+        rng = random.Random(9)
+        claims = [Claim(i, Square(rng.randint(0, 40), rng.randint(0, 40)), rng.randint(1, 8), rng.randint(1, 8)) for i in range(60)]
+        expected = set()
+        for i in range(len(claims)):
+            for j in range(i + 1, len(claims)):
+                if set(claims[i].squares()) & set(claims[j].squares()):
+                    expected.add((claims[i], claims[j]))
+        actual = list(fabric.find_conflicts(claims))
+        self.assertEqual(len(expected), len(actual))
+        self.assertSetEqual(expected, set(actual))
+
+
+class TestRowIntervals(unittest.TestCase):
+
+    def test_overlapping(self):
+        intervals = [(0, 4), (2, 3), (3, 8), (5, 6), (8, 9)]
+        index = fabric.RowIntervals(itertools.chain.from_iterable(intervals))
+        for key, (start, end) in enumerate(intervals):
+            index.add(start, end, key)
+        index.discard(5, 6, 3)
+        for start, end in intervals:
+            with self.subTest(start=start, end=end):
+                expected = {key for key, (s, e) in enumerate(intervals) if key != 3 and s < end and start < e}
+                actual = list(index.overlapping(start, end))
+                self.assertEqual(len(expected), len(actual))
+                self.assertSetEqual(expected, set(actual))
+
+
+class TestClaimGridStream(unittest.TestCase):
+
+    def test_stream(self):
+        lines = ['#1 @ 1,3: 4x4\n', '#2 @ 3,1: 4x4\n', '#3 @ 5,5: 2x2\n', '#4 @ 0,0: 2x2\n']
+        grid = ClaimGrid(Square(0, 0), 0, 0)
+        actual = [(claim.claim_id, multi, claimed) for claim, multi, claimed in grid.stream(lines)]
+        self.assertEqual([(1, 0, 16), (2, 4, 28), (3, 4, 32), (4, 4, 36)], actual)
+
+    def test_matches_batch(self):
+        import random
+        rng = random.Random(11)
+        claims = [Claim(i, Square(rng.randint(0, 50), rng.randint(0, 50)), rng.randint(1, 9), rng.randint(1, 9)) for i in range(80)]
+        grid = ClaimGrid(Square(0, 0), 0, 0)
+        for n, claim in enumerate(claims, 1):
+            grid.add(claim)
+            self.assertEqual(fabric.count_overlaps(claims[:n]), (grid.count_multiclaimed(), grid.count_claimed()))
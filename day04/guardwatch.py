@@ -2,11 +2,20 @@
 
 import sys
 import re
+import time
+import heapq
+import signal
+import logging
+import argparse
+from datetime import date
+from operator import itemgetter
 
-from collections import defaultdict
+_log = logging.getLogger(__name__)
 
 MINUTES_PER_HOUR = 60
 MINUTES_PER_DAY = MINUTES_PER_HOUR * 24
+WINDOW_WEEK = 'week'
+WINDOW_MONTH = 'month'
 
 class Time(tuple):
 
@@ -15,6 +24,7 @@ class Time(tuple):
     day = None
     hour = None
     minute = None
+    epoch = None
 
     def __new__(cls, year, month, day, hour, minute):
         me = super(Time, cls).__new__(cls, tuple([year, month, day, hour, minute]))
@@ -23,7 +33,15 @@ class Time(tuple):
         me.year = year
         me.month = month
         me.day = day
+        me.epoch = date(year, month, day).toordinal() * MINUTES_PER_DAY + hour * MINUTES_PER_HOUR + minute
         return me
+
+    @classmethod
+    def from_epoch(cls, epoch):
+        """Creates a time from its epoch, the number of minutes since the start of the day before 0001-01-01."""
+        days, minutes = divmod(epoch, MINUTES_PER_DAY)
+        d = date.fromordinal(days)
+        return Time(d.year, d.month, d.day, minutes // MINUTES_PER_HOUR, minutes % MINUTES_PER_HOUR)
     
     @classmethod
     def parse(cls, line):
@@ -31,13 +49,26 @@ class Time(tuple):
         assert m is not None, "line does not match pattern: " + repr(line)
         year, month, day, hour, minute = [int(m.group(i)) for i in range(1, 6)]
         return Time(year, month, day, hour, minute)
+
+    @classmethod
+    def decode(cls, line):
+        """Decodes the time from a line by slicing its fixed-width [YYYY-MM-DD HH:MM] prefix.
+        Lines in other formats are parsed with the regular expression instead.
+        """
+        if line[17:18] == ']' and line[0] == '[' and line[5] == '-' and line[8] == '-' and line[14] == ':':
+            try:
+                return Time(int(line[1:5]), int(line[6:8]), int(line[9:11]), int(line[12:14]), int(line[15:17]))
+            except ValueError:
+                pass
+        return Time.parse(line)
+
+    def key(self):
+        """Returns an integer that orders times the same way the tuples are ordered."""
+        return self.epoch
     
     def since(self, then):
         """Calculates minutes between the argument Time and this time."""
-        diff = [self[i] - then[i] for i in range(len(then))]
-        assert diff[0] == 0 and diff[1] == 0, "can't calculate minutes across months or years: " + str([self, then])
-        minutes = diff[2] * MINUTES_PER_DAY + diff[3] * MINUTES_PER_HOUR + diff[4]
-        return minutes
+        return self.epoch - then.epoch
 
 
 
@@ -45,6 +76,8 @@ class Shift(tuple):
 
     guard_id = None
     events = tuple()
+    asleep_mask = 0
+    minutes_asleep = 0
 
     def __new__(cls, guard_id, events):
         """Constructs a new shift object.
@@ -52,70 +85,134 @@ class Shift(tuple):
         """
         assert len(events) > 0, "expect at least one event in shift"
         if len(events) % 2 == 0:
-            # add an event representing waking up at the end of the shift (01:00)
+            # add an event representing waking up at the end of the shift (the next 01:00)
             last = events[-1]
-            events.append(Time(last.year, last.month, last.day, 1, 0))
+            day = last.epoch // MINUTES_PER_DAY + (0 if last.hour < 1 else 1)
+            events.append(Time.from_epoch(day * MINUTES_PER_DAY + MINUTES_PER_HOUR))
         events = tuple(events)
         me = super(Shift, cls).__new__(cls, tuple([guard_id, events]))
         me.guard_id = guard_id
         me.events = events
+        me.asleep_mask = Shift.compute_asleep_mask(events)
+        me.minutes_asleep = sum(events[i].since(events[i - 1]) for i in range(2, len(events), 2))
         return me
+
+    @staticmethod
+    def compute_asleep_mask(events):
+        """Computes an integer whose bit m is set if the guard is asleep at minute m of a midnight hour.
+        Naps may cross midnight and month or year boundaries; only minutes in a midnight hour count.
+        """
+        mask = 0
+        for i in range(2, len(events), 2):
+            start, end = events[i - 1].epoch, events[i].epoch
+            for day in range(start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY + 1):
+                midnight = day * MINUTES_PER_DAY
+                first, last = max(start, midnight) - midnight, min(end, midnight + MINUTES_PER_HOUR) - midnight
+                if last > first:
+                    mask |= (1 << last) - (1 << first)
+        return mask
+
+    def date(self):
+        """Returns the date of the midnight hour that this shift covers.
+        Shifts start between 23:00 and 00:59, so this is the date an hour after the start.
+        """
+        return date.fromordinal((self.events[0].epoch + MINUTES_PER_HOUR) // MINUTES_PER_DAY)
     
     def list_minutes_asleep(self):
-        minutes = []
-        for i in range(1, len(self.events)):
-            if i % 2 == 0:
-                falls_asleep = self.events[i - 1]
-                wakes_up = self.events[i]
-                minutes += list(range(falls_asleep.minute, wakes_up.minute))
-        return minutes
+        return [minute for minute in range(MINUTES_PER_HOUR) if self.asleep_mask >> minute & 1]
     
     def count_minutes_asleep(self):
-        total = 0
-        for i in range(1, len(self.events)):
-            if i % 2 == 0:
-                falls_asleep = self.events[i - 1]
-                wakes_up = self.events[i]
-                duration = wakes_up.since(falls_asleep)
-                total += duration
-        return total
+        return self.minutes_asleep
     
     def is_asleep_at_minute(self, minute):
-        return minute in self.list_minutes_asleep()
+        return self.asleep_mask >> minute & 1 == 1
+
+
+_GUARD_PATTERN = re.compile(r'Guard\s+#(\d+)\s+')
 
 
 class ShiftParser(object):
 
     def parse(self, lines):
-        event_lines = {}
+        """Parses shifts from event lines, which may be in any order.
+        
+        Each line is decoded once. Events are ordered by a stable sort on their
+        time keys, so events sharing a timestamp are all kept, and the sort is
+        skipped if the lines are already in order.
+        """
+        timed_lines = []
+        in_order = True
+        last_key = None
         for line in lines:
             if not line:
                 continue
-            event_time = Time.parse(line)
-            event_lines[event_time] = line
-        shifts = []
-        guard_id = None
-        events = []
-        event_times = sorted(event_lines.keys())
-        for event_time in event_times:
-            line = event_lines[event_time]
-            if not line:
+            event_time = Time.decode(line)
+            key = event_time.key()
+            if last_key is not None and key < last_key:
+                in_order = False
+            last_key = key
+            timed_lines.append((key, event_time, line))
+        if not in_order:
+            timed_lines.sort(key=itemgetter(0))
+        return list(self.assemble((event_time, line) for _, event_time, line in timed_lines))
+
+    def stream(self, lines):
+        """Yields shifts as they complete from event lines that are already in order.
+        Only the events of the current shift are held in memory.
+        """
+        return self.assemble(self._decode_ordered(lines))
+
+    def _decode_ordered(self, lines):
+        last_key = None
+        for line in lines:
+            if not line.strip():
                 continue
-            event_time = Time.parse(line)
-            if 'Guard' in line:
-                if guard_id is not None:
-                    shift = Shift(guard_id, events)
-                    events = []
-                    shifts.append(shift)
-                m = re.search("Guard\s+#(\d+)\s+", line)
-                assert m is not None, "line does not match pattern: " + line
-                guard_id = m.group(1)
-            events.append(event_time)
-        if guard_id is not None:
-            shift = Shift(guard_id, events)
-            events = []
-            shifts.append(shift)
-        return shifts
+            event_time = Time.decode(line)
+            key = event_time.key()
+            if last_key is not None and key < last_key:
+                raise ValueError("event out of order: " + line.strip())
+            last_key = key
+            yield event_time, line
+
+    def assemble(self, timed_lines):
+        """Yields shifts from ordered (Time, line) pairs."""
+        assembler = ShiftAssembler()
+        for event_time, line in timed_lines:
+            shift = assembler.push(event_time, line)
+            if shift is not None:
+                yield shift
+        shift = assembler.finish()
+        if shift is not None:
+            yield shift
+
+
+class ShiftAssembler(object):
+    """Groups ordered events into shifts, one event at a time."""
+
+    def __init__(self):
+        self.guard_id = None
+        self.events = []
+
+    def push(self, event_time, line):
+        """Adds an event and returns the shift it completes, if any."""
+        shift = None
+        if 'Guard' in line:
+            if self.guard_id is not None:
+                shift = Shift(self.guard_id, self.events)
+                self.events = []
+            m = _GUARD_PATTERN.search(line)
+            assert m is not None, "line does not match pattern: " + line
+            self.guard_id = m.group(1)
+        self.events.append(event_time)
+        return shift
+
+    def finish(self):
+        """Returns the shift in progress, if any, and resets."""
+        shift = None
+        if self.guard_id is not None:
+            shift = Shift(self.guard_id, self.events)
+        self.guard_id, self.events = None, []
+        return shift
 
 
 def print_minute_histo(histo):
@@ -124,6 +221,18 @@ def print_minute_histo(histo):
         print("%02d %s" % (minute, count))
 
 
+def minute_histogram(shifts):
+    """Returns a list of the number of shifts in which the guard was asleep at each minute."""
+    histo = [0] * MINUTES_PER_HOUR
+    for shift in shifts:
+        mask = shift.asleep_mask
+        while mask:
+            low = mask & -mask
+            histo[low.bit_length() - 1] += 1
+            mask ^= low
+    return histo
+
+
 def argmax(scriptable, keys):
     mx = None
     a = None
@@ -134,49 +243,263 @@ def argmax(scriptable, keys):
             a = key
     return a, mx
 
+class SleepMatrix(object):
+    """Guard-by-minute matrix of the number of shifts in which each guard was asleep at each minute.
+    
+    The matrix is built in one pass over the shifts; the puzzle questions are
+    argmax queries over its rows and columns. Rows are kept in order of each
+    guard's first shift. The sleepiest guard is the first guard whose running
+    total reached the highest total, and for a given minute, ties go to the
+    guard who was first asleep at that minute.
+    """
+
+    def __init__(self):
+        self.guard_ids = []
+        self.rows = {}
+        self.totals = {}
+        self.num_shifts = 0
+        self._first_asleep = {}
+        self._sleepiest = None, None
+
+    @classmethod
+    def from_shifts(cls, shifts):
+        matrix = SleepMatrix()
+        for shift in shifts:
+            matrix.add(shift)
+        return matrix
+
+    def add(self, shift):
+        row = self.rows.get(shift.guard_id)
+        if row is None:
+            row = self.rows[shift.guard_id] = [0] * MINUTES_PER_HOUR
+            self._first_asleep[shift.guard_id] = [None] * MINUTES_PER_HOUR
+            self.totals[shift.guard_id] = 0
+            self.guard_ids.append(shift.guard_id)
+        first_asleep = self._first_asleep[shift.guard_id]
+        mask = shift.asleep_mask
+        total = self.totals[shift.guard_id] = self.totals[shift.guard_id] + shift.count_minutes_asleep()
+        if self._sleepiest[1] is None or total > self._sleepiest[1]:
+            self._sleepiest = shift.guard_id, total
+        while mask:
+            low = mask & -mask
+            minute = low.bit_length() - 1
+            row[minute] += 1
+            if first_asleep[minute] is None:
+                first_asleep[minute] = self.num_shifts
+            mask ^= low
+        self.num_shifts += 1
+
+    def count(self, guard_id, minute):
+        row = self.rows.get(guard_id)
+        return 0 if row is None else row[minute]
+
+    def column(self, minute):
+        return [self.rows[guard_id][minute] for guard_id in self.guard_ids]
+
+    def sleepiest_guard(self):
+        """Returns a tuple of the guard with the most minutes asleep and that number of minutes."""
+        return self._sleepiest
+
+    def sleepiest_minute(self, guard_id):
+        """Returns a tuple of the minute the guard was most often asleep and the number of shifts."""
+        row = self.rows[guard_id]
+        return argmax(row, range(MINUTES_PER_HOUR))
+
+    def sleepiest_at_minute(self, minute):
+        """Returns a tuple of the guard most often asleep at a minute and the number of shifts."""
+        best, best_key = (None, None), None
+        for guard_id in self.guard_ids:
+            count = self.rows[guard_id][minute]
+            if count:
+                key = count, -self._first_asleep[guard_id][minute]
+                if best_key is None or key > best_key:
+                    best, best_key = (guard_id, count), key
+        return best
+
+    def most_consistent(self):
+        """Returns a tuple of the guard and minute with the highest count and that count."""
+        best = None, None, None
+        for minute in range(MINUTES_PER_HOUR):
+            guard_id, count = self.sleepiest_at_minute(minute)
+            if guard_id is not None and (best[2] is None or count > best[2]):
+                best = guard_id, minute, count
+        return best
+
+
+class GuardWatcher(object):
+    """Keeps a SleepMatrix up to date as event lines arrive.
+    
+    Lines pass through a reorder buffer of bounded size: an event is applied
+    only once more than reorder_window newer lines have arrived, so lines that
+    are at most that far out of place are put back in order. Lines older than
+    an event already applied are counted as late and dropped.
+    """
+
+    def __init__(self, reorder_window=64):
+        self.reorder_window = reorder_window
+        self.matrix = SleepMatrix()
+        self.num_late = 0
+        self._assembler = ShiftAssembler()
+        self._pending = []
+        self._num_received = 0
+        self._released_key = None
+
+    def feed(self, line):
+        if not line.strip():
+            return
+        event_time = Time.decode(line)
+        key = event_time.key()
+        if self._released_key is not None and key < self._released_key:
+            self.num_late += 1
+            _log.warning("dropping late event: %s", line.strip())
+            return
+        heapq.heappush(self._pending, (key, self._num_received, event_time, line))
+        self._num_received += 1
+        while len(self._pending) > self.reorder_window:
+            self._release()
+
+    def _release(self):
+        key, _, event_time, line = heapq.heappop(self._pending)
+        self._released_key = key
+        shift = self._assembler.push(event_time, line)
+        if shift is not None:
+            self.matrix.add(shift)
+
+    def flush(self):
+        """Applies all buffered events and closes the shift in progress."""
+        while self._pending:
+            self._release()
+        shift = self._assembler.finish()
+        if shift is not None:
+            self.matrix.add(shift)
+
+    def answers(self):
+        """Returns a tuple of the part 1 and part 2 (guard_id, minute) answers over completed shifts."""
+        part1 = None, None
+        if self.matrix.guard_ids:
+            sleepiest_guard, _ = self.matrix.sleepiest_guard()
+            part1 = sleepiest_guard, self.matrix.sleepiest_minute(sleepiest_guard)[0]
+        guard_id, minute, _ = self.matrix.most_consistent()
+        return part1, (guard_id, minute)
+
+    def report(self, ofile=sys.stdout):
+        for part, (guard_id, minute) in enumerate(self.answers(), 1):
+            if guard_id is None or minute is None:
+                print("part %d: no shifts yet" % part, file=ofile)
+            else:
+                print("part %d: guard %s at minute %02d (%d)" % (part, guard_id, minute, int(guard_id) * minute), file=ofile)
+        ofile.flush()
+
+
+def follow(ifile, poll_interval=1.0):
+    """Yields lines from a file as they are appended to it, forever.
+    A line is yielded only once its terminating newline has been written, and an
+    empty string is yielded after each wait for more, so the consumer gets a turn
+    while the file is idle.
+    """
+    partial = ''
+    while True:
+        line = ifile.readline()
+        if line.endswith('\n'):
+            yield partial + line
+            partial = ''
+        else:
+            partial += line
+            time.sleep(poll_interval)
+            yield ''
+
+
+def serve(lines, reorder_window):
+    """Feeds lines to a watcher, printing the current answers whenever SIGUSR1 is received.
+    The signal handler only records the request; answers are printed between lines.
+    """
+    watcher = GuardWatcher(reorder_window)
+    requests = []
+    signal.signal(signal.SIGUSR1, lambda signum, frame: requests.append(signum))
+    for line in lines:
+        watcher.feed(line)
+        while requests:
+            requests.pop()
+            watcher.report()
+    watcher.flush()
+    watcher.report()
+    return watcher
+
+
+def window_label(shift, window):
+    shift_date = shift.date()
+    if window == WINDOW_MONTH:
+        return "%04d-%02d" % (shift_date.year, shift_date.month)
+    if window == WINDOW_WEEK:
+        year, week, _ = shift_date.isocalendar()
+        return "%04d-W%02d" % (year, week)
+    raise ValueError("invalid window: " + str(window))
+
+
+def aggregate_windows(shifts, window):
+    """Yields (label, SleepMatrix) tuples for each week or month of ordered shifts.
+    Only the current window's matrix is held in memory.
+    """
+    label, matrix = None, None
+    for shift in shifts:
+        shift_label = window_label(shift, window)
+        if shift_label != label:
+            if matrix is not None:
+                yield label, matrix
+            label, matrix = shift_label, SleepMatrix()
+        matrix.add(shift)
+    if matrix is not None:
+        yield label, matrix
+
+
+def print_windows(lines, window):
+    for label, matrix in aggregate_windows(ShiftParser().stream(lines), window):
+        sleepiest_guard, most_minutes_slept = matrix.sleepiest_guard()
+        sleepiest_minute, _ = matrix.sleepiest_minute(sleepiest_guard)
+        consistent_guard, consistent_minute, count = matrix.most_consistent()
+        print("%s sleepiest guard %4s (%d minutes, mostly at %02d); most consistent guard %4s at %s (%s shifts)" % (
+            label, sleepiest_guard, most_minutes_slept, sleepiest_minute, consistent_guard,
+            "--" if consistent_minute is None else "%02d" % consistent_minute, count or 0))
+
+
 def compute_stuff():
     lines = [line for line in sys.stdin]
     shifts = ShiftParser().parse(lines)
-    shifts_by_guard = defaultdict(list)
-    sleep_counts = defaultdict(int)
-    sleepiest_guard, most_minutes_slept = None, -1
-    for shift in shifts:
-        shifts_by_guard[shift.guard_id].append(shift)
-        minutes = shift.count_minutes_asleep()
-        sleep_counts[shift.guard_id] += minutes
-        if sleep_counts[shift.guard_id] > most_minutes_slept:
-            sleepiest_guard = shift.guard_id
-            most_minutes_slept = sleep_counts[shift.guard_id]
-    print("sleepest guard is {} ({} minutes)".format(sleepiest_guard, sleep_counts[sleepiest_guard]))
-    histo = defaultdict(int)
-    for shift in shifts_by_guard[sleepiest_guard]:
-        minutes = shift.list_minutes_asleep()
-        for minute in minutes:
-            histo[minute] += 1
-    print_minute_histo(histo)
-    sleepage = defaultdict(list)
-    for minute in range(MINUTES_PER_HOUR):
-        for shift in shifts:
-            if shift.is_asleep_at_minute(minute):
-                sleepage[minute].append(shift.guard_id)
-    # histo is map of minute -> guard_count
-    # guard_count is map of guard_id -> number of shifts for guard was asleep at that minute
-    histo = {}  
-    for minute, guard_ids in sleepage.items():
-        guard_count = defaultdict(int)
-        for guard_id in guard_ids:
-            guard_count[guard_id] += 1
-        histo[minute] = guard_count
+    matrix = SleepMatrix.from_shifts(shifts)
+    sleepiest_guard, most_minutes_slept = matrix.sleepiest_guard()
+    print("sleepest guard is {} ({} minutes)".format(sleepiest_guard, most_minutes_slept))
+    histo = matrix.rows.get(sleepiest_guard, ())
+    print_minute_histo({minute: count for minute, count in enumerate(histo) if count})
     print()
     print("minute / sleepiest / # sleeps")
-    for minute in sorted(histo.keys()):
-        guard_count = histo[minute]
-        sleepiest_at_minute, count = argmax(guard_count, guard_count.keys())
-        print("%02d guard %4s %d" % (minute, sleepiest_at_minute, count))
+    for minute in range(MINUTES_PER_HOUR):
+        sleepiest_at_minute, count = matrix.sleepiest_at_minute(minute)
+        if count:
+            print("%02d guard %4s %d" % (minute, sleepiest_at_minute, count))
     return 0
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--window", choices=(WINDOW_WEEK, WINDOW_MONTH), help="report per window from ordered input in one pass")
+    parser.add_argument("--serve", action='store_true', help="keep answers current as lines arrive; send SIGUSR1 to print them")
+    parser.add_argument("--follow", metavar="FILE", help="with --serve, tail FILE instead of reading standard input")
+    parser.add_argument("--reorder-window", type=int, default=64, metavar="N", help="with --serve, reorder lines up to N places out of order")
+    args = parser.parse_args()
+    if args.serve:
+        if args.follow:
+            with open(args.follow, 'r') as ifile:
+                serve(follow(ifile), args.reorder_window)
+        else:
+            serve(sys.stdin, args.reorder_window)
+        return 0
+    if args.window:
+        try:
+            print_windows(sys.stdin, args.window)
+        except ValueError as e:
+            print("guardwatch: --window requires input sorted by time; {}".format(e), file=sys.stderr)
+            return 1
+        return 0
     compute_stuff()
     return 0
 
@@ -1,6 +1,14 @@
 #!/usr/bin/env python3
 
+import io
+import os
+import sys
+import signal
+import contextlib
 import unittest
+from unittest import mock
+from datetime import date
+import guardwatch
 from guardwatch import Time, Shift, ShiftParser
 
 class TestTime(unittest.TestCase):
@@ -11,6 +19,14 @@ class TestTime(unittest.TestCase):
         t = Time.parse('[1518-11-01 00:00] Guard #10 begins shift\n')
         self.assertEqual(Time(1518, 11, 1, 0, 0), t)
     
+    def test_decode(self):
+        for line in ('[1518-11-01 00:05] falls asleep', '[1518-11-01 23:58] Guard #99 begins shift\n', '[1518-3-1 0:5] wakes up'):
+            self.assertEqual(Time.parse(line), Time.decode(line))
+
+    def test_key(self):
+        times = [Time(1518, 11, 1, 0, 5), Time(1518, 10, 31, 23, 59), Time(1517, 12, 31, 0, 0), Time(1518, 11, 1, 0, 4)]
+        self.assertEqual(sorted(times), sorted(times, key=Time.key))
+
     def test_since(self):
         now = Time(1518, 11, 1, 0, 25)
         then = Time(1518, 11, 1, 0, 5)
@@ -18,8 +34,15 @@ class TestTime(unittest.TestCase):
         now = Time(1518, 11, 2, 0, 40)
         then = Time(1518, 11, 1, 23, 58)
         self.assertEqual(42, now.since(then))
-        # now, then = (1518, 10, 14, 0, 0), (1518, 9, 25, 0, 28)
-        # self.assertEqual()
+        now, then = Time(1518, 10, 14, 0, 0), Time(1518, 9, 25, 0, 28)
+        self.assertEqual(19 * 24 * 60 - 28, now.since(then))
+        now, then = Time(1519, 1, 1, 0, 10), Time(1518, 12, 31, 23, 50)
+        self.assertEqual(20, now.since(then))
+
+    def test_from_epoch(self):
+        t = Time(1518, 12, 31, 23, 59)
+        self.assertEqual(t, Time.from_epoch(t.epoch))
+        self.assertEqual(Time(1519, 1, 1, 0, 0), Time.from_epoch(t.epoch + 1))
 
 
 class TestShiftParser(unittest.TestCase):
@@ -51,4 +74,148 @@ class TestShiftParser(unittest.TestCase):
         self.assertEqual(len(first.events), 5)
         last = shifts[-1]
         self.assertEqual(last.guard_id, '99')
-        self.assertEqual(len(last.events), 3)
\ No newline at end of file
+        self.assertEqual(len(last.events), 3)
+
+    def test_parse_unordered(self):
+        lines = ['[1518-11-01 00:25] wakes up', '[1518-11-01 00:00] Guard #10 begins shift', '[1518-11-01 00:05] falls asleep',
+                 '[1518-11-02 00:00] Guard #99 begins shift', '[1518-11-02 00:00] falls asleep', '[1518-11-02 00:10] wakes up']
+        shifts = ShiftParser().parse(lines)
+        self.assertEqual(['10', '99'], [shift.guard_id for shift in shifts])
+        self.assertEqual(list(range(5, 25)), shifts[0].list_minutes_asleep())
+        self.assertEqual(list(range(0, 10)), shifts[1].list_minutes_asleep())
+
+
+class TestShift(unittest.TestCase):
+
+    def test_asleep_mask(self):
+        shift = Shift('10', [Time(1518, 11, 1, 0, 0), Time(1518, 11, 1, 0, 5), Time(1518, 11, 1, 0, 8), Time(1518, 11, 1, 0, 58)])
+        self.assertEqual([5, 6, 7, 58, 59], shift.list_minutes_asleep())
+        self.assertEqual(5, shift.count_minutes_asleep())
+        self.assertTrue(shift.is_asleep_at_minute(59))
+        self.assertFalse(shift.is_asleep_at_minute(8))
+
+    def test_minute_histogram(self):
+        a = Shift('10', [Time(1518, 11, 1, 0, 0), Time(1518, 11, 1, 0, 5), Time(1518, 11, 1, 0, 7)])
+        b = Shift('10', [Time(1518, 11, 2, 0, 0), Time(1518, 11, 2, 0, 6), Time(1518, 11, 2, 0, 9)])
+        histo = guardwatch.minute_histogram([a, b])
+        self.assertEqual(60, len(histo))
+        self.assertEqual([1, 2, 1, 1], histo[5:9])
+        self.assertEqual(5, sum(histo))
+
+
+class TestSleepMatrix(unittest.TestCase):
+
+    def test_queries(self):
+        with open(os.path.join(os.path.dirname(__file__), 'sample.txt'), 'r') as ifile:
+            shifts = ShiftParser().parse([line for line in ifile])
+        matrix = guardwatch.SleepMatrix.from_shifts(shifts)
+        self.assertEqual(['10', '99'], matrix.guard_ids)
+        self.assertEqual(('10', 50), matrix.sleepiest_guard())
+        self.assertEqual((24, 2), matrix.sleepiest_minute('10'))
+        self.assertEqual(('99', 45, 3), matrix.most_consistent())
+        self.assertEqual(('10', 1), matrix.sleepiest_at_minute(50))
+        self.assertEqual((None, None), matrix.sleepiest_at_minute(59))
+        self.assertEqual([1, 3], matrix.column(45))
+        self.assertEqual(0, matrix.count('42', 45))
+
+    def test_sleepiest_guard_tie(self):
+        lines = ['[1518-11-01 00:00] Guard #1 begins shift', '[1518-11-01 00:10] falls asleep', '[1518-11-01 00:15] wakes up',
+                 '[1518-11-02 00:00] Guard #2 begins shift', '[1518-11-02 00:10] falls asleep', '[1518-11-02 00:20] wakes up',
+                 '[1518-11-03 00:00] Guard #1 begins shift', '[1518-11-03 00:30] falls asleep', '[1518-11-03 00:35] wakes up']
+        matrix = guardwatch.SleepMatrix.from_shifts(ShiftParser().parse(lines))
+        self.assertEqual(('2', 10), matrix.sleepiest_guard())
+
+
+class TestShiftAcrossBoundaries(unittest.TestCase):
+
+    def test_nap_across_new_year(self):
+        shift = Shift('7', [Time(1518, 12, 31, 23, 40), Time(1518, 12, 31, 23, 55), Time(1519, 1, 1, 0, 3)])
+        self.assertEqual([0, 1, 2], shift.list_minutes_asleep())
+        self.assertEqual(8, shift.count_minutes_asleep())
+        self.assertEqual(date(1519, 1, 1), shift.date())
+
+    def test_asleep_at_end_of_shift(self):
+        shift = Shift('7', [Time(1518, 10, 31, 23, 58), Time(1518, 11, 1, 0, 57)])
+        self.assertEqual(Time(1518, 11, 1, 1, 0), shift.events[-1])
+        self.assertEqual([57, 58, 59], shift.list_minutes_asleep())
+
+    def test_aggregate_windows(self):
+        lines = ['[1518-10-31 23:58] Guard #10 begins shift', '[1518-11-01 00:05] falls asleep', '[1518-11-01 00:25] wakes up',
+                 '[1518-11-01 23:58] Guard #99 begins shift', '[1518-11-02 00:40] falls asleep', '[1518-11-02 00:50] wakes up',
+                 '[1518-12-03 00:05] Guard #10 begins shift', '[1518-12-03 00:24] falls asleep', '[1518-12-03 00:29] wakes up']
+        windows = list(guardwatch.aggregate_windows(ShiftParser().stream(lines), guardwatch.WINDOW_MONTH))
+        self.assertEqual(['1518-11', '1518-12'], [label for label, _ in windows])
+        self.assertEqual(('10', 20), windows[0][1].sleepiest_guard())
+        self.assertEqual(('10', 5), windows[1][1].sleepiest_guard())
+        with self.assertRaises(ValueError):
+            list(ShiftParser().stream(reversed(lines)))
+
+    def test_window_cli_unsorted(self):
+        with open(os.path.join(os.path.dirname(__file__), 'input.txt'), 'r') as ifile:
+            stdin = io.StringIO(ifile.read())
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with mock.patch.object(sys, 'argv', ['guardwatch.py', '--window', 'week']), mock.patch.object(sys, 'stdin', stdin):
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                self.assertEqual(1, guardwatch.main())
+        self.assertIn("requires input sorted by time", stderr.getvalue())
+
+
+class TestGuardWatcher(unittest.TestCase):
+
+    def read_sample(self):
+        with open(os.path.join(os.path.dirname(__file__), 'sample.txt'), 'r') as ifile:
+            return [line for line in ifile if line.strip()]
+
+    def test_reorders_within_window(self):
+        lines = self.read_sample()
+        lines[1], lines[3] = lines[3], lines[1]
+        watcher = guardwatch.GuardWatcher(reorder_window=4)
+        for line in lines:
+            watcher.feed(line)
+        self.assertEqual(3, watcher.matrix.num_shifts)
+        watcher.flush()
+        self.assertEqual(0, watcher.num_late)
+        self.assertEqual((('10', 24), ('99', 45)), watcher.answers())
+        expected = guardwatch.SleepMatrix.from_shifts(ShiftParser().parse(lines))
+        self.assertEqual(expected.rows, watcher.matrix.rows)
+
+    def test_drops_late(self):
+        lines = self.read_sample()
+        watcher = guardwatch.GuardWatcher(reorder_window=1)
+        for line in lines[1:] + lines[:1]:
+            watcher.feed(line)
+        watcher.flush()
+        self.assertEqual(1, watcher.num_late)
+
+    def test_follow_joins_partial_lines(self):
+        reads = iter(['[1518-11-01 00:00] Guard #1', '', '0 begins shift\n', '[1518-11-01 00:05] falls asleep\n'])
+        class Appending(object):
+            def readline(self):
+                return next(reads, '')
+        followed = (line for line in guardwatch.follow(Appending(), poll_interval=0) if line)
+        lines = [next(followed), next(followed)]
+        self.assertEqual(['[1518-11-01 00:00] Guard #10 begins shift\n', '[1518-11-01 00:05] falls asleep\n'], lines)
+        watcher = guardwatch.GuardWatcher(reorder_window=1)
+        for line in lines:
+            watcher.feed(line)
+        self.assertEqual(0, watcher.num_late)
+        self.assertEqual(1, len(watcher._pending))
+        watcher.flush()
+        self.assertEqual(1, watcher.matrix.num_shifts)
+        self.assertEqual(('10', 55), watcher.matrix.sleepiest_guard())
+
+    def test_serve_reports_between_lines(self):
+        lines = self.read_sample()
+        def signalling():
+            for i, line in enumerate(lines):
+                if i == 5:
+                    os.kill(os.getpid(), signal.SIGUSR1)
+                yield line
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            with mock.patch.object(guardwatch.GuardWatcher, 'report') as report:
+                watcher = guardwatch.serve(signalling(), reorder_window=4)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        self.assertEqual(2, report.call_count)
+        self.assertEqual(5, watcher.matrix.num_shifts)
@@ -3,14 +3,28 @@
 import sys
 import io
 import math
+import bisect
 import logging
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from array import array
+from collections.abc import Mapping, Sequence
 from operator import itemgetter
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 _ctype = int  # type of a component of a coordinate pair
 _log = logging.getLogger(__name__)
 
+ENGINE_SCAN = 'scan'
+ENGINE_FLOOD = 'flood'
+NO_OWNER = -1  # label of a cell that is equidistant from more than one point
+ENGINE_SEPARABLE = 'separable'
+
 
 def sq(x):
     return x * x
@@ -18,17 +32,29 @@ def sq(x):
 
 class Point(tuple):
 
-    x, y = None, None
+    __slots__ = ()
+
+    x = property(itemgetter(0))
+    y = property(itemgetter(1))
 
     def __new__(cls, x, y):
-        me = super(Point, cls).__new__(cls, [x, y])
-        me.x = x
-        me.y = y
-        return me
+        return tuple.__new__(cls, (x, y))
     
     @classmethod
     def manhattan(cls, p, q):
         return abs(p[0] - q[0]) + abs(p[1] - q[1])
+
+    @classmethod
+    def chebyshev(cls, p, q):
+        return max(abs(p[0] - q[0]), abs(p[1] - q[1]))
+
+    @classmethod
+    def squared_euclidean(cls, p, q):
+        return sq(p[0] - q[0]) + sq(p[1] - q[1])
+
+    @classmethod
+    def euclidean(cls, p, q):
+        return math.sqrt(sq(p[0] - q[0]) + sq(p[1] - q[1]))
     
     def distance(self, p, q=None):
         """Computes the distance between this point and another. Arguments can
@@ -57,20 +83,94 @@ class Point(tuple):
             return Point(*point_or_tuple)
     
 
+class Metric(object):
+    """A distance function paired with a kernel that, given the points' coordinates, returns
+    a function of a cell's (x, y) giving the distances to every point.
+    """
+
+    def __init__(self, name, distance, kernel):
+        self.name = name
+        self.distance = distance
+        self.kernel = kernel
+
+    def batch(self, points):
+        return self.batch_coordinates([p[0] for p in points], [p[1] for p in points])
+
+    def batch_coordinates(self, xs, ys):
+        if numpy is not None:
+            xs, ys = numpy.array(xs), numpy.array(ys)
+        return self.kernel(xs, ys)
+
+
+def _manhattan_kernel(xs, ys):
+    if numpy is not None:
+        return lambda x, y: numpy.abs(xs - x) + numpy.abs(ys - y)
+    return lambda x, y: [abs(x - a) + abs(y - b) for a, b in zip(xs, ys)]
+
+
+def _chebyshev_kernel(xs, ys):
+    if numpy is not None:
+        return lambda x, y: numpy.maximum(numpy.abs(xs - x), numpy.abs(ys - y))
+    return lambda x, y: [max(abs(x - a), abs(y - b)) for a, b in zip(xs, ys)]
+
+
+def _squared_euclidean_kernel(xs, ys):
+    if numpy is not None:
+        return lambda x, y: (xs - x) ** 2 + (ys - y) ** 2
+    return lambda x, y: [sq(x - a) + sq(y - b) for a, b in zip(xs, ys)]
+
+
+def _euclidean_kernel(xs, ys):
+    if numpy is not None:
+        return lambda x, y: numpy.sqrt((xs - x) ** 2 + (ys - y) ** 2)
+    return lambda x, y: [math.sqrt(sq(x - a) + sq(y - b)) for a, b in zip(xs, ys)]
+
+
+METRIC_MANHATTAN = 'manhattan'
+METRIC_CHEBYSHEV = 'chebyshev'
+METRIC_EUCLIDEAN = 'euclidean'
+METRIC_SQUARED_EUCLIDEAN = 'squared-euclidean'
+METRICS = {}
+
+
+def register_metric(metric):
+    METRICS[metric.name] = metric
+    return metric
+
+
+register_metric(Metric(METRIC_MANHATTAN, Point.manhattan, _manhattan_kernel))
+register_metric(Metric(METRIC_CHEBYSHEV, Point.chebyshev, _chebyshev_kernel))
+register_metric(Metric(METRIC_EUCLIDEAN, Point.euclidean, _euclidean_kernel))
+register_metric(Metric(METRIC_SQUARED_EUCLIDEAN, Point.squared_euclidean, _squared_euclidean_kernel))
+
+
+def _closest(distances):
+    """Returns the index of the smallest distance, or None if it is not unique."""
+    if numpy is not None and isinstance(distances, numpy.ndarray):
+        k = int(distances.argmin())
+        return None if numpy.count_nonzero(distances == distances[k]) > 1 else k
+    min_distance = min(distances)
+    if distances.count(min_distance) > 1:
+        return None
+    return distances.index(min_distance)
+
+
 class Grid(object):
 
-    def __init__(self, corner, width, height, points):
+    def __init__(self, corner, width, height, points, metric=METRIC_MANHATTAN):
         self.corner = Point.wrap(corner)
         self.width = width
         self.height = height
         self.points = tuple([Point.wrap(p) for p in points])
         assert len(self.points) == len(set(self.points))
-        self._cells = None
-        self._cells_to_owners = None
-        self.distance = Point.manhattan
+        self._owner_labels = None
+        self._kernel = None
+        self.metric = METRICS[metric]
+        self.distance = self.metric.distance
+        self.owner_engine = ENGINE_FLOOD
     
     @classmethod
-    def containing(cls, points, topleft=None, bottomright=None):
+    def containing(cls, points, topleft=None, bottomright=None, metric=METRIC_MANHATTAN):
         if topleft is None:
             min_x, min_y = min([p[0] for p in points]), min([p[1] for p in points])
         else:
@@ -81,7 +181,7 @@ class Grid(object):
             max_x, max_y = bottomright
         width = max_x - min_x + 1
         height = max_y - min_y + 1
-        return Grid(Point(min_x, min_y), width, height, points)
+        return Grid(Point(min_x, min_y), width, height, points, metric)
     
     def size(self):
         return self.width * self.height
@@ -100,50 +200,116 @@ class Grid(object):
         return sorted(set(pts))
     
     def cells(self):
-        if self._cells is None:
-            cells = []
-            for i in range(self.width):
-                for j in range(self.height):
-                    cells.append(self.corner.translate((i, j)))
-            self._cells = tuple(cells)
-        return self._cells
+        """Returns a sequence of the cells of the grid as Points, column by column."""
+        return CellSequence(self)
     
+    def contains(self, p):
+        return 0 <= p[0] - self.corner.x < self.width and 0 <= p[1] - self.corner.y < self.height
+
+    def index(self, p):
+        """Returns the position of a cell in the grid's row-major arrays."""
+        return (p[1] - self.corner.y) * self.width + (p[0] - self.corner.x)
+
+    def cell_at(self, index):
+        """Returns the cell at a position in the grid's row-major arrays."""
+        j, i = divmod(index, self.width)
+        return Point(self.corner.x + i, self.corner.y + j)
+
     def map_cells_to_owners(self):
-        """Returns a dictionary mapping each cell to the point that is closest."""
-        if self._cells_to_owners is None:
-            owners = defaultdict(lambda: None)
-            for cell in self.cells():
-                owner = self.find_owner(cell)
-                if owner is not None:
-                    owners[cell] = owner
-            self._cells_to_owners = owners
-        return self._cells_to_owners    
+        """Returns a mapping from each cell to the point that is closest."""
+        return OwnerMap(self)
+
+    def _can_flood(self):
+        return (self.owner_engine == ENGINE_FLOOD and self.metric.name == METRIC_MANHATTAN
+                and all(self.contains(p) for p in self.points))
+
+    def kernel(self):
+        """Returns the metric's batched distance function for this grid's points."""
+        if self._kernel is None:
+            self._kernel = self.metric.batch(self.points)
+        return self._kernel
+
+    def label_owners(self):
+        """Returns an array('i') of the index of each cell's closest point in row-major order,
+        or NO_OWNER where there is a tie. Computed by a breadth-first flood fill from all points
+        when the metric allows it, otherwise by scoring each cell with the metric's kernel.
+        """
+        if self._owner_labels is None and not self._can_flood():
+            kernel = self.kernel()
+            labels = array('i', [NO_OWNER]) * self.size()
+            for j in range(self.height):
+                for i in range(self.width):
+                    k = _closest(kernel(self.corner.x + i, self.corner.y + j)) if self.points else None
+                    if k is not None:
+                        labels[j * self.width + i] = k
+            self._owner_labels = labels
+        if self._owner_labels is None:
+            width, size = self.width, self.size()
+            labels = array('i', [NO_OWNER]) * size
+            steps = array('i', [-1]) * size
+            frontier = []
+            for k, p in enumerate(self.points):
+                index = (p.y - self.corner.y) * width + (p.x - self.corner.x)
+                labels[index] = k
+                steps[index] = 0
+                frontier.append(index)
+            step = 0
+            while frontier:
+                step += 1
+                next_frontier = []
+                for index in frontier:
+                    owner = labels[index]
+                    x = index % width
+                    for neighbor in (index - 1 if x > 0 else -1,
+                                     index + 1 if x < width - 1 else -1,
+                                     index - width,
+                                     index + width if index + width < size else -1):
+                        if neighbor < 0:
+                            continue
+                        if steps[neighbor] < 0:
+                            steps[neighbor] = step
+                            labels[neighbor] = owner
+                            next_frontier.append(neighbor)
+                        elif steps[neighbor] == step and labels[neighbor] != owner:
+                            labels[neighbor] = NO_OWNER
+                frontier = next_frontier
+            self._owner_labels = labels
+        return self._owner_labels
     
     def find_owner(self, cell):
-        cell = Point.wrap(cell)
-        closest_p = None
-        min_distance = None
-        distance_counts = defaultdict(int)
-        for p in self.points:
-            distance = self.distance(cell, p)
-            distance_counts[distance] += 1
-            if min_distance is None or distance < min_distance:
-                closest_p = p
-                min_distance = distance
-        if distance_counts[min_distance] > 1:
+        if not self.points:
             return None
-        return closest_p
+        k = _closest(self.kernel()(cell[0], cell[1]))
+        return None if k is None else self.points[k]
         
     
+    def count_areas(self):
+        """Returns a list of the number of cells owned by each point, in the order of the points."""
+        areas = [0] * len(self.points)
+        for label in self.label_owners():
+            if label != NO_OWNER:
+                areas[label] += 1
+        return areas
+
+    def border_owners(self):
+        """Returns the set of indexes of points that own a cell on the border of the grid.
+        Their areas would grow without bound on a larger grid.
+        """
+        labels, width = self.label_owners(), self.width
+        border = set(labels[:width])
+        border.update(labels[len(labels) - width:])
+        border.update(labels[::width])
+        border.update(labels[width - 1::width])
+        border.discard(NO_OWNER)
+        return border
+
     def find_turf(self, p):
         p = Point.wrap(p)
-        cells_to_owners = self.map_cells_to_owners()
-        turf = set()
-        for cell in cells_to_owners:
-            owner = cells_to_owners[cell]
-            if p == owner:
-                turf.add(cell)
-        return turf
+        if p not in self.points:
+            return set()
+        k = self.points.index(p)
+        labels = self.label_owners()
+        return set(self.cell_at(index) for index in range(len(labels)) if labels[index] == k)
     
     def _create_label_map(self, labels=None):
         labels = labels or 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
@@ -156,29 +322,36 @@ class Grid(object):
     
     def render(self, ofile=sys.stdout, labels=None):
         label_map = self._create_label_map(labels)
-        cells_to_owners = self.map_cells_to_owners()
+        owner_labels = self.label_owners()
         for j in range(self.height):
+            row = []
             for i in range(self.width):
-                cell = self.corner.translate((i, j))
-                owner = cells_to_owners[cell]
-                label = label_map[owner] if owner is not None else '.'
-                if cell != owner:
+                k = owner_labels[j * self.width + i]
+                if k == NO_OWNER:
+                    row.append('.')
+                    continue
+                owner = self.points[k]
+                label = label_map[owner]
+                if (self.corner.x + i, self.corner.y + j) != owner:
                     label = label.lower()
-                print(label, end='', file=ofile)
-            print(file=ofile)
+                row.append(label)
+            print(''.join(row), file=ofile)
     
     def rendering(self, labels=None):
         buffer = io.StringIO()
         self.render(buffer, labels)
         return buffer.getvalue()
 
-    def distance_sum(self, p, dist_fn=Point.manhattan):
+    def distance_sum(self, p, dist_fn=None):
+        """Sums the distances from a cell to all points, with the grid's metric unless dist_fn is given."""
+        if dist_fn is None:
+            return self.kernel()(p[0], p[1]).sum() if numpy is not None else sum(self.kernel()(p[0], p[1]))
         s = 0
         for q in self.points:
             s += dist_fn(q, p)
         return s
     
-    def region_size(self, max_dist, dist_fn=Point.manhattan):
+    def region_size(self, max_dist, dist_fn=None):
         region_size = 0
         for y in range(self.corner.y, self.corner.y + self.height):
             for x in range(self.corner.x, self.corner.x + self.width):
@@ -188,8 +361,108 @@ class Grid(object):
                     region_size += 1
         return region_size
 
+    def region_size_separable(self, max_dist, grow=True):
+        """Counts cells whose distance sum to all points is less than max_dist from separate
+        x and y sums; if grow is true, cells beyond the grid count too. Metrics that do not
+        split into x and y terms fall back to region_size.
+        """
+        if self.metric.name == METRIC_MANHATTAN:
+            axis_sums = _axis_distance_sums
+        elif self.metric.name == METRIC_SQUARED_EUCLIDEAN:
+            axis_sums = _axis_squared_sums
+        else:
+            _log.debug("metric %s is not separable; scanning the grid", self.metric.name)
+            return self.region_size(max_dist)
+        min_x, min_y = self.corner
+        max_x, max_y = min_x + self.width - 1, min_y + self.height - 1
+        if grow and self.points:
+            # beyond the points' bounding box, a cell d steps out adds at least d (or d squared) per point
+            margin = max_dist // len(self.points) + 1
+            if axis_sums is _axis_squared_sums:
+                margin = math.isqrt(margin) + 1
+            min_x = min(min_x, min(p.x for p in self.points) - margin)
+            min_y = min(min_y, min(p.y for p in self.points) - margin)
+            max_x = max(max_x, max(p.x for p in self.points) + margin)
+            max_y = max(max_y, max(p.y for p in self.points) + margin)
+        x_sums = axis_sums([p.x for p in self.points], min_x, max_x)
+        y_sums = sorted(axis_sums([p.y for p in self.points], min_y, max_y))
+        return sum(bisect.bisect_left(y_sums, max_dist - x_sum) for x_sum in x_sums)
+
     
 
+class CellSequence(Sequence):
+    """Read-only sequence of a grid's cells, column by column, creating each Point when it is accessed."""
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[k] for k in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("cell index out of range")
+        i, j = divmod(index, self.grid.height)
+        return Point(self.grid.corner.x + i, self.grid.corner.y + j)
+
+    def __contains__(self, cell):
+        return isinstance(cell, tuple) and len(cell) == 2 and self.grid.contains(cell)
+
+    def __len__(self):
+        return self.grid.size()
+
+
+class OwnerMap(Mapping):
+    """Read-only view of a grid's owner labels as a mapping from owned cells to points.
+    Looking up a cell that is tied or outside the grid returns None, as a defaultdict would.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.labels = grid.label_owners()
+
+    def _label(self, cell):
+        if not self.grid.contains(cell):
+            return NO_OWNER
+        return self.labels[self.grid.index(cell)]
+
+    def __getitem__(self, cell):
+        label = self._label(cell)
+        return None if label == NO_OWNER else self.grid.points[label]
+
+    def __contains__(self, cell):
+        return self._label(cell) != NO_OWNER
+
+    def __iter__(self):
+        for index, label in enumerate(self.labels):
+            if label != NO_OWNER:
+                yield self.grid.cell_at(index)
+
+    def __len__(self):
+        return len(self.labels) - self.labels.count(NO_OWNER)
+
+
+def _axis_distance_sums(coords, start, stop):
+    """Returns a list of the sums of |c - v| over coords, for each c from start to stop inclusive."""
+    coords = sorted(coords)
+    total = sum(abs(start - v) for v in coords)
+    num_at_or_below = bisect.bisect_right(coords, start)
+    sums = [total]
+    for c in range(start + 1, stop + 1):
+        total += num_at_or_below - (len(coords) - num_at_or_below)
+        while num_at_or_below < len(coords) and coords[num_at_or_below] <= c:
+            num_at_or_below += 1
+        sums.append(total)
+    return sums
+
+
+def _axis_squared_sums(coords, start, stop):
+    """Returns a list of the sums of (c - v) ** 2 over coords, for each c from start to stop inclusive."""
+    n, total, total_squares = len(coords), sum(coords), sum(sq(v) for v in coords)
+    return [n * sq(c) - 2 * c * total + total_squares for c in range(start, stop + 1)]
+
+
 def parse_coords(ifile, ctype=_ctype):
     """Parses a list of coordinate pairs."""
     points = [tuple(map(ctype, pair.split(", "))) for pair in ifile if pair]
@@ -197,21 +470,112 @@ def parse_coords(ifile, ctype=_ctype):
     return points
 
 
-def find_max_finite_area(grid):
+def find_areas(grid):
+    """Returns a dictionary mapping each point to the area of its turf, or to None if the area is infinite."""
+    areas = grid.count_areas()
+    infinite = grid.border_owners()
+    return {p: (None if k in infinite else areas[k]) for k, p in enumerate(grid.points)}
+
+
+def _manhattan_row_labels(xs, ys, x0, width, y):
+    """Returns a list of the owner labels of the cells x0 to x0 + width - 1 in row y under
+    the Manhattan metric, found by one pass across the row from each end.
+    """
+    unreached = float('inf')
+    seeds, seed_owners = [unreached] * width, [NO_OWNER] * width
+    for k, (px, py) in enumerate(zip(xs, ys)):
+        i = min(max(px - x0, 0), width - 1)
+        d = abs(py - y) + abs(px - x0 - i)
+        if d < seeds[i]:
+            seeds[i], seed_owners[i] = d, k
+        elif d == seeds[i]:
+            seed_owners[i] = NO_OWNER
+    right, labels = seeds[:], seed_owners[:]
+    for i in range(width - 2, -1, -1):
+        d = right[i + 1] + 1
+        if d < right[i]:
+            right[i], labels[i] = d, labels[i + 1]
+        elif d == right[i]:
+            labels[i] = NO_OWNER
+    left, left_owner = unreached, NO_OWNER
+    for i in range(width):
+        if left < right[i]:
+            labels[i] = left_owner
+        elif left == right[i]:
+            labels[i] = NO_OWNER
+        if seeds[i] < left:
+            left, left_owner = seeds[i], seed_owners[i]
+        elif seeds[i] == left:
+            left_owner = NO_OWNER
+        left += 1
+    return labels
+
+
+def _band_areas(shm_name, num_points, corner, width, height, metric_name, row_start, row_stop):
+    """Counts the cells each point owns in rows [row_start, row_stop) of a grid and notes
+    which points own cells on the grid's border. Points are read from shared memory.
+    """
+    shm = SharedMemory(name=shm_name)
+    try:
+        coordinates = shm.buf.cast('q')
+        xs, ys = coordinates[:num_points].tolist(), coordinates[num_points:2 * num_points].tolist()
+        coordinates.release()
+    finally:
+        shm.close()
+    if metric_name == METRIC_MANHATTAN:
+        row_labels = lambda y: _manhattan_row_labels(xs, ys, corner[0], width, y)
+    else:
+        kernel = METRICS[metric_name].batch_coordinates(xs, ys)
+        def row_labels(y):
+            row = [_closest(kernel(corner[0] + i, y)) for i in range(width)]
+            return [NO_OWNER if k is None else k for k in row]
+    areas = [0] * num_points
+    border = set()
+    for j in range(row_start, row_stop):
+        row = row_labels(corner[1] + j)
+        for k in row:
+            if k != NO_OWNER:
+                areas[k] += 1
+        border.update(row if j == 0 or j == height - 1 else (row[0], row[-1]))
+    border.discard(NO_OWNER)
+    return areas, border
+
+
+def find_areas_parallel(grid, workers, band_rows=None):
+    """Computes the same table as find_areas by splitting the grid into bands of rows
+    that are processed in a pool of worker processes.
+    """
+    num_points = len(grid.points)
+    if num_points == 0:
+        return {}
+    if band_rows is None:
+        band_rows = max(1, -(-grid.height // (workers * 4)))
+    coordinates = array('q', [p.x for p in grid.points] + [p.y for p in grid.points])
+    shm = SharedMemory(create=True, size=len(coordinates) * coordinates.itemsize)
+    try:
+        shm.buf[:len(coordinates) * coordinates.itemsize] = coordinates.tobytes()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_band_areas, shm.name, num_points, tuple(grid.corner), grid.width, grid.height,
+                                       grid.metric.name, row_start, min(row_start + band_rows, grid.height))
+                       for row_start in range(0, grid.height, band_rows)]
+            areas, infinite = [0] * num_points, set()
+            for future in futures:
+                band_areas, band_border = future.result()
+                areas = [a + b for a, b in zip(areas, band_areas)]
+                infinite.update(band_border)
+    finally:
+        shm.close()
+        shm.unlink()
+    return {p: (None if k in infinite else areas[k]) for k, p in enumerate(grid.points)}
+
+
+def find_max_finite_area(grid, areas=None):
     max_area, max_owner = None, None
-    border = grid.border()
     nignored = 0
-    for p in grid.points:
-        turf = grid.find_turf(p)
-        turf_on_border = False
-        for t in turf:
-            if t in border:
-                turf_on_border = True
-                break
-        if turf_on_border:
+    for p, area in (find_areas(grid) if areas is None else areas).items():
+        if area is None:
             nignored += 1
             continue
-        area = len(turf)
         _log.debug("{} has turf with area {}".format(p, area))
         if max_area is None or area > max_area:
             max_area = area
@@ -221,13 +585,17 @@ def find_max_finite_area(grid):
 
 
 def part1(grid, args):
-    max_owner, max_area = find_max_finite_area(grid)
+    areas = find_areas_parallel(grid, args.workers) if args.workers else None
+    max_owner, max_area = find_max_finite_area(grid, areas)
     assert max_owner is not None, "no max owner found; no finite areas?"
     print("{} has turf with max area {}".format(max_owner, max_area))
 
 
 def part2(grid, args):
-    region_size = grid.region_size(args.max_dist)
+    if args.region_engine == ENGINE_SEPARABLE:
+        region_size = grid.region_size_separable(args.max_dist)
+    else:
+        region_size = grid.region_size(args.max_dist)
     print("max region size with dist < {} is {}".format(args.max_dist, region_size))
 
         
@@ -237,11 +605,16 @@ def main():
     parser.add_argument("part", type=int, choices=(1, 2))
     parser.add_argument("-v", "--verbose", action="store_true", default=False)
     parser.add_argument("--max-dist", type=int, default=10000)
+    parser.add_argument("--owner-engine", choices=(ENGINE_SCAN, ENGINE_FLOOD), default=ENGINE_FLOOD, help="how cell owners are computed")
+    parser.add_argument("--workers", type=int, metavar="N", help="part 1: compute ownership in bands of rows across N processes")
+    parser.add_argument("--metric", choices=sorted(METRICS.keys()), default=METRIC_MANHATTAN)
+    parser.add_argument("--region-engine", choices=(ENGINE_SCAN, ENGINE_SEPARABLE), default=ENGINE_SCAN, help="how the part 2 region is measured; separable also counts cells beyond the grid, and scans for metrics that are not separable")
     args = parser.parse_args()
     logging.basicConfig(level=(logging.DEBUG if args.verbose else logging.INFO))
     coord_pairs = parse_coords(sys.stdin)
     _log.debug("%s points in input", len(coord_pairs))
-    grid = Grid.containing(coord_pairs)
+    grid = Grid.containing(coord_pairs, metric=args.metric)
+    grid.owner_engine = args.owner_engine
     part = {
         1: part1,
         2: part2,
@@ -3,7 +3,9 @@
 import sys
 import math
 import unittest
+from unittest import mock
 import io
+import coords
 from coords import Point, Grid, parse_coords
 
 class PointTest(unittest.TestCase):
@@ -24,6 +26,12 @@ class PointTest(unittest.TestCase):
         self.assertTrue(p is Point.wrap(p))
         self.assertTrue(isinstance(Point.wrap([0, 0]), Point))
 
+    def test_compact(self):
+        p = Point(3, 4)
+        self.assertEqual((3, 4), (p.x, p.y))
+        self.assertEqual(hash((3, 4)), hash(p))
+        self.assertFalse(hasattr(p, '__dict__'))
+
 
 def sample_grid():
         text = """1, 1
@@ -205,3 +213,110 @@ bBb....ccc
         g = Grid.containing([(0, 0)])
         self.assertEqual(1, g.region_size(1))
         
+
+    def test_flood_matches_scan(self):
+        import random
+        rng = random.Random(6)
+        for trial in range(20):
+            points = list(set((rng.randint(0, 15), rng.randint(0, 12)) for _ in range(rng.randint(1, 12))))
+            flooded, scanned = Grid.containing(points), Grid.containing(points)
+            scanned.owner_engine = coords.ENGINE_SCAN
+            with self.subTest(points=points):
+                self.assertEqual(dict(scanned.map_cells_to_owners()), dict(flooded.map_cells_to_owners()))
+
+    def test_label_owners(self):
+        g = Grid.containing([(0, 0), (2, 0)])
+        self.assertEqual([0, coords.NO_OWNER, 1], list(g.label_owners()))
+
+    def test_region_size_separable(self):
+        g = sample_grid()
+        for max_dist in (20, 32, 40, 60):
+            with self.subTest(max_dist=max_dist):
+                self.assertEqual(g.region_size(max_dist), g.region_size_separable(max_dist, grow=False))
+        self.assertEqual(16, g.region_size_separable(32))
+
+    def test_region_size_separable_grows(self):
+        g = Grid.containing([(0, 0)])
+        self.assertEqual(1, g.region_size_separable(3, grow=False))
+        self.assertEqual(13, g.region_size_separable(3))
+        g = sample_grid()
+        wide = Grid.containing(g.points, (-50, -50), (60, 60))
+        self.assertEqual(wide.region_size(80), g.region_size_separable(80))
+
+    def test_region_size_separable_falls_back(self):
+        g = Grid.containing(sample_grid().points, metric=coords.METRIC_CHEBYSHEV)
+        self.assertEqual(g.region_size(30), g.region_size_separable(30))
+
+    def test_find_areas(self):
+        g = sample_grid()
+        expected = {(1, 1): None, (1, 6): None, (8, 3): None, (3, 4): 9, (5, 5): 17, (8, 9): None}
+        self.assertDictEqual(expected, coords.find_areas(g))
+        self.assertEqual([len(g.find_turf(p)) for p in g.points], g.count_areas())
+        self.assertEqual(((5, 5), 17), coords.find_max_finite_area(g))
+
+    def test_owner_map(self):
+        g = Grid.containing([(0, 0), (2, 0)])
+        owners = g.map_cells_to_owners()
+        self.assertEqual(2, len(owners))
+        self.assertEqual([(0, 0), (2, 0)], list(owners))
+        self.assertEqual((2, 0), owners[(2, 0)])
+        self.assertIsNone(owners[(1, 0)])
+        self.assertIsNone(owners[(5, 5)])
+        self.assertNotIn((1, 0), owners)
+        self.assertEqual(1, g.index((1, 0)))
+        self.assertEqual(Point(1, 0), g.cell_at(1))
+
+    def test_cells(self):
+        g = Grid((1, 2), 3, 2, [(1, 2)])
+        expected = [(x, y) for x in range(1, 4) for y in range(2, 4)]
+        cells = g.cells()
+        self.assertEqual(6, len(cells))
+        self.assertEqual(expected, list(cells))
+        self.assertEqual(expected, list(cells))
+        self.assertEqual(Point(3, 3), cells[-1])
+        self.assertEqual(tuple(expected[1:3]), cells[1:3])
+        self.assertIn((2, 3), cells)
+        self.assertNotIn((0, 0), cells)
+        with self.assertRaises(IndexError):
+            cells[6]
+
+    def test_metrics(self):
+        p, q = (1, 2), (4, 6)
+        expected = {coords.METRIC_MANHATTAN: 7, coords.METRIC_CHEBYSHEV: 4, coords.METRIC_EUCLIDEAN: 5.0, coords.METRIC_SQUARED_EUCLIDEAN: 25}
+        for name, distance in expected.items():
+            metric = coords.METRICS[name]
+            self.assertEqual(distance, metric.distance(p, q))
+            self.assertEqual([0, distance], list(metric.batch([p, q])(*p)))
+
+    def test_metric_engines_agree(self):
+        points = sample_grid().points
+        for name in coords.METRICS:
+            for numpy in ((None, coords.numpy) if coords.numpy is not None else (None,)):
+                with self.subTest(metric=name, numpy=numpy is not None), mock.patch.object(coords, 'numpy', numpy):
+                    g = Grid.containing(points, (0, 0), (9, 9), metric=name)
+                    for cell in g.cells():
+                        distances = [g.distance(cell, p) for p in points]
+                        closest = [p for p, d in zip(points, distances) if d == min(distances)]
+                        self.assertEqual(closest[0] if len(closest) == 1 else None, g.find_owner(cell))
+                        self.assertEqual(sum(distances), g.distance_sum(cell))
+                    if name in (coords.METRIC_MANHATTAN, coords.METRIC_SQUARED_EUCLIDEAN):
+                        self.assertEqual(g.region_size(60), g.region_size_separable(60, grow=False))
+
+    def test_manhattan_row_labels(self):
+        import random
+        rng = random.Random(6)
+        for trial in range(20):
+            points = list({(rng.randint(-3, 12), rng.randint(-3, 12)) for _ in range(rng.randint(1, 8))})
+            xs, ys = [p[0] for p in points], [p[1] for p in points]
+            g = Grid.containing(points, (0, 0), (9, 9))
+            for y in range(10):
+                with self.subTest(trial=trial, y=y):
+                    expected = [coords.NO_OWNER if g.find_owner((x, y)) is None else points.index(g.find_owner((x, y))) for x in range(10)]
+                    self.assertEqual(expected, coords._manhattan_row_labels(xs, ys, 0, 10, y))
+
+    def test_find_areas_parallel(self):
+        g = sample_grid()
+        self.assertDictEqual(coords.find_areas(g), coords.find_areas_parallel(g, 2, band_rows=3))
+        g = Grid.containing(g.points, (0, 0), (9, 9), metric=coords.METRIC_CHEBYSHEV)
+        self.assertDictEqual(coords.find_areas(g), coords.find_areas_parallel(g, 2))
+        self.assertEqual(((5, 5), 17), coords.find_max_finite_area(sample_grid(), coords.find_areas_parallel(sample_grid(), 2)))
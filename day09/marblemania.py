@@ -5,25 +5,64 @@ import io
 import os
 import logging
 import argparse
+from array import array
+from collections import deque
 
 
 _log = logging.getLogger(__name__)
 MONEY = 23
+ENGINE_LINKED = 'linked'
+ENGINE_ARRAY = 'array'
+ENGINE_BATCHED = 'batched'
 
 
 def _NOOP(*args, **kwargs):
     pass
 
 
+class Leaderboard(object):
+    """Running high score shared by the players of one game, whose scores only increase.
+    Ties go to the player with the lowest position, as in a scan of the players in order.
+    """
+
+    __slots__ = ('high', 'scorer')
+
+    def __init__(self, scorer=None, high=0):
+        self.high = high
+        self.scorer = scorer
+
+    def update(self, player, score):
+        if score > self.high or (score == self.high and player.position < self.scorer.position):
+            self.high = score
+            self.scorer = player
+
+
 class Player(object):
 
-    def __init__(self, tag):
+    __slots__ = ('_score', 'tag', 'leaderboard', 'position')
+
+    def __init__(self, tag, leaderboard=None, position=None):
         self._score = 0
         self.tag = tag
+        self.leaderboard = leaderboard
+        self.position = position
+
+    @classmethod
+    def create_all(cls, nplayers):
+        """Creates players tagged 1 to nplayers that share a leaderboard."""
+        leaderboard = Leaderboard()
+        players = [Player(i + 1, leaderboard, i) for i in range(nplayers)]
+        leaderboard.scorer = players[0] if players else None
+        return players
 
     def keep(self, marble):
         assert marble and isinstance(marble.n, int)
-        self._score += marble.n
+        return self.award(marble.n)
+
+    def award(self, points):
+        self._score += points
+        if self.leaderboard is not None:
+            self.leaderboard.update(self, self._score)
         return self._score
     
     def score(self):
@@ -31,6 +70,15 @@ class Player(object):
     
     @classmethod
     def high_scorer(cls, players):
+        """Returns the first player in the list with the highest score. That is read from
+        the leaderboard if every player shares it (see create_all), the players are in
+        order of position, and the leader is among them.
+        """
+        leaderboard = players[0].leaderboard if players else None
+        if (leaderboard is not None and leaderboard.scorer in players
+                and all(player.leaderboard is leaderboard for player in players)
+                and all(a.position < b.position for a, b in zip(players, players[1:]))):
+            return leaderboard.scorer
         high, scorer = None, None
         for player in players:
             score = player.score()
@@ -46,6 +94,8 @@ class Player(object):
 
 class Marble(object):
 
+    __slots__ = ('n', 'prev', 'next')
+
     def __init__(self, n, prev=None, next=None):
         self.n = n
         assert n is not None
@@ -99,9 +149,14 @@ class Marble(object):
 
 class Circle(object):
 
-    def __init__(self, curr=None):
-        self.curr = curr or Marble(0)
-        self.count = len(self.marbles())
+    def __init__(self, curr=None, count=None):
+        """Creates a circle around the given marble. If the number of marbles in the
+        circle is not given, it is counted by traversing the circle.
+        """
+        if curr is None:
+            curr, count = Marble(0), 1
+        self.curr = curr
+        self.count = len(self.marbles()) if count is None else count
     
     def marbles(self):
         return self.curr.foreach(lambda m: m, True)
@@ -151,7 +206,7 @@ class Circle(object):
     def construct(cls, values, current_value):
         assert values
         if len(values) == 1:
-            return Circle(Marble(values[0]))
+            return Circle(Marble(values[0]), 1)
         marble = None
         first = None
         current = None
@@ -168,9 +223,143 @@ class Circle(object):
         marble.next = first
         first.prev = marble
         assert current is not None, "current marble value not in list of values"
-        return Circle(current)
+        return Circle(current, len(values))
     
 
+class ArrayCircle(object):
+    """Circle of marbles whose values index preallocated next/prev arrays, so that
+    no object is allocated per marble. Marble values must be distinct integers
+    no greater than the capacity, which grows as needed.
+    """
+
+    def __init__(self, curr=0, capacity=0):
+        self.next, self.prev = array('i'), array('i')
+        self.ensure_capacity(max(curr, capacity))
+        self.curr = curr
+        self.count = 1
+
+    def ensure_capacity(self, capacity):
+        if capacity >= len(self.next):
+            self.next.extend(range(len(self.next), capacity + 1))
+            self.prev.extend(range(len(self.prev), capacity + 1))
+
+    def marbles(self):
+        values = [self.curr]
+        value = self.next[self.curr]
+        while value != self.curr:
+            values.append(value)
+            value = self.next[value]
+        return values
+
+    def render(self, ofile=sys.stdout):
+        values = self.marbles()
+        lowest = values.index(min(values))
+        for value in values[lowest:] + values[:lowest]:
+            val = str(value)
+            if value == self.curr:
+                val = "({})".format(val)
+            print(val, end=" ", file=ofile)
+
+    def rendering(self):
+        buff = io.StringIO()
+        self.render(buff)
+        return buff.getvalue()
+
+    def advance(self, k):
+        links = self.next if k > 0 else self.prev
+        value = self.curr
+        for i in range(abs(k)):
+            value = links[value]
+        return value
+
+    def add(self, value):
+        self.ensure_capacity(value)
+        insertion_pt = self.next[self.curr]
+        post_insertion_pt = self.next[insertion_pt]
+        self.prev[post_insertion_pt] = value
+        self.next[insertion_pt] = value
+        self.prev[value] = insertion_pt
+        self.next[value] = post_insertion_pt
+        self.curr = value
+        self.count += 1
+
+    def remove(self, value):
+        assert self.count > 1, "tried to remove {} from circle containing only {}".format(value, self.curr)
+        prev, nxt = self.prev[value], self.next[value]
+        self.next[prev] = nxt
+        self.prev[nxt] = prev
+        self.curr = nxt
+        self.count -= 1
+
+    @classmethod
+    def construct(cls, values, current_value):
+        assert values
+        assert current_value in values, "current marble value not in list of values"
+        circle = ArrayCircle(current_value, max(values))
+        for i in range(len(values)):
+            circle.next[values[i]] = values[(i + 1) % len(values)]
+            circle.prev[values[i]] = values[i - 1]
+        circle.count = len(values)
+        return circle
+
+
+class BatchedGame(object):
+    """Game played on a deque, one whole round of moneyball marbles at a time.
+    
+    The current marble is kept at the right end of the deque. Within a round,
+    each new marble goes after the marble that follows the current one, so the
+    round's inserts interleave the next moneyball - 1 marbles with the new
+    values; that is done with one bulk extend. Scores accumulate in an
+    array('q') indexed by player position rather than in Player objects.
+    """
+
+    def __init__(self, nplayers, moneyball=MONEY):
+        self.circle = deque([0])
+        self.state = 0
+        self.moneyball = moneyball
+        self.scores = array('q', [0]) * nplayers
+
+    def _insert(self, values):
+        circle = self.circle
+        if len(circle) > len(values):
+            popleft = circle.popleft
+            merged = [0] * (2 * len(values))
+            merged[0::2] = [popleft() for _ in values]
+            merged[1::2] = values
+            circle.extend(merged)
+        else:
+            for value in values:
+                circle.rotate(-1)
+                circle.append(value)
+        self.state = values[-1] if values else self.state
+
+    def play(self, max_marble_value, callback=None):
+        """Plays up to the given marble and returns a tuple of the high scorer's position and score.
+        Players take turns as in Game.play. The callback, if any, is called after each round.
+        """
+        circle, scores, nplayers = self.circle, self.scores, len(self.scores)
+        while self.state + self.moneyball <= max_marble_value:
+            self._insert(range(self.state + 1, self.state + self.moneyball))
+            self.state += 1
+            circle.rotate(7)
+            removed = circle.pop()
+            circle.rotate(-1)
+            scores[(max_marble_value + self.state) % nplayers] += self.state + removed
+            if callback is not None:
+                callback(self.state, scores, circle)
+        self._insert(range(self.state + 1, max_marble_value + 1))
+        return self.high_scorer()
+
+    def high_scorer(self):
+        high = max(self.scores)
+        return self.scores.index(high), high
+
+    def rendering(self):
+        values = list(self.circle)
+        lowest = values.index(min(values))
+        return " ".join(("({})" if value == values[-1] else "{}").format(value) for value in values[lowest:] + values[:lowest]) + " "
+
+
 class Game(object):
 
     def __init__(self, circle=None, state=None, moneyball=MONEY):
@@ -189,7 +378,12 @@ class Game(object):
         else:
             self.circle.add(marble)
     
+    def prepare(self, max_marble_value):
+        """Called before play begins with the value of the last marble to be played."""
+        pass
+
     def play(self, players, max_marble_value, callback=None):
+        self.prepare(max_marble_value)
         callback = callback or _NOOP
         nrounds = max_marble_value + 1
         while True:
@@ -200,6 +394,27 @@ class Game(object):
             if self.state >= max_marble_value:
                 break
         return Player.high_scorer(players)
+
+
+class ArrayGame(Game):
+    """Game played on an ArrayCircle, with marble values as plain ints."""
+
+    def __init__(self, circle=None, state=None, moneyball=MONEY):
+        super(ArrayGame, self).__init__(circle or ArrayCircle(), state, moneyball)
+
+    def prepare(self, max_marble_value):
+        self.circle.ensure_capacity(max_marble_value)
+
+    def step(self, player):
+        self.state += 1
+        value = self.state
+        if value % self.moneyball == 0:
+            player.award(value)
+            sevenccw = self.circle.advance(-7)
+            player.award(sevenccw)
+            self.circle.remove(sevenccw)
+        else:
+            self.circle.add(value)
     
 
 def main():
@@ -207,14 +422,18 @@ def main():
     parser.add_argument("-l", "--log-level", choices=('DEBUG', 'INFO', 'WARN', 'ERROR'), default='INFO', help="set log level")
     parser.add_argument("-v", "--verbose", action='store_const', const='DEBUG', dest='log_level', help="set log level DEBUG")
     parser.add_argument("--marble-factor", type=int, default=1, help="last marble factor; use 100 for part 2")
+    parser.add_argument("--engine", choices=(ENGINE_LINKED, ENGINE_ARRAY, ENGINE_BATCHED), default=ENGINE_LINKED, help="circle implementation")
     args = parser.parse_args()
     logging.basicConfig(level=logging.__dict__[args.log_level])
     nelves, last_marble = 435, 71184  # puzzle input
     last_marble *= args.marble_factor
-    players = [Player(i + 1) for i in range(nelves)]    
-    game = Game()
-    high_scorer = game.play(players, last_marble)
-    high_score = high_scorer.score()
+    if args.engine == ENGINE_BATCHED:
+        _, high_score = BatchedGame(nelves).play(last_marble)
+    else:
+        players = Player.create_all(nelves)
+        game = ArrayGame() if args.engine == ENGINE_ARRAY else Game()
+        high_scorer = game.play(players, last_marble)
+        high_score = high_scorer.score()
     # _log.debug("%s elves up to marble %s: high score %s", nelves, last_marble_n, high_score)
     print("{} elves, last marble is worth {} points: high score is {}".format(nelves, last_marble, high_score))
     return 0
@@ -6,7 +6,7 @@ import unittest
 import io
 import marblemania
 import logging
-from marblemania import Circle, Marble, Player, Game
+from marblemania import Circle, Marble, Player, Game, ArrayCircle, ArrayGame, BatchedGame
 
 
 _log = logging.getLogger(__name__)
@@ -26,6 +26,52 @@ class TestMarble(unittest.TestCase):
     def test_nothing(self):
         _log.debug("hello, world")
 
+    def test_slotted(self):
+        self.assertFalse(hasattr(Marble(0), '__dict__'))
+        self.assertFalse(hasattr(Player(1), '__dict__'))
+
+
+class TestPlayer(unittest.TestCase):
+
+    def test_high_scorer_tracked(self):
+        players = Player.create_all(4)
+        for tag, points in [(3, 5), (1, 7), (2, 4), (3, 2), (4, 9), (2, 5)]:
+            players[tag - 1].award(points)
+        self.assertIs(players[1], players[0].leaderboard.scorer)
+        self.assertIs(players[1], Player.high_scorer(players))
+
+    def test_high_scorer_tie(self):
+        players = Player.create_all(3)
+        self.assertIs(players[0], Player.high_scorer(players))
+        players[1].award(5)
+        players[0].award(5)
+        self.assertIs(players[0], players[0].leaderboard.scorer)
+        self.assertIs(players[0], Player.high_scorer(players))
+        players[2].award(5)
+        self.assertIs(players[0], Player.high_scorer(players))
+        self.assertIs(players[1], Player.high_scorer(players[1:]))
+        self.assertIs(players[2], Player.high_scorer(players[::-1]))
+
+    def test_high_scorer_subset(self):
+        players = Player.create_all(4)
+        players[0].award(9)
+        players[2].award(5)
+        self.assertIs(players[2], Player.high_scorer(players[1:]))
+        others = Player.create_all(2)
+        others[1].award(7)
+        self.assertIs(others[1], Player.high_scorer(players[2:] + others))
+        self.assertIs(players[2], Player.high_scorer(players[2:] + others[:1]))
+
+    def test_high_scorer_matches_scan(self):
+        for nelves, last_marble_n in [(9, 25), (10, 1618), (13, 7999)]:
+            with self.subTest(nelves=nelves):
+                tracked = Player.create_all(nelves)
+                Game().play(tracked, last_marble_n)
+                scanned = [Player(p.tag) for p in tracked]
+                for original, copy in zip(tracked, scanned):
+                    copy.award(original.score())
+                self.assertEqual(Player.high_scorer(scanned).tag, Player.high_scorer(tracked).tag)
+
 
 class TestCircle(unittest.TestCase):
 
@@ -41,6 +87,12 @@ class TestCircle(unittest.TestCase):
             self.assertIsNotNone(m.prev, "prev is None on " + str(m))
             self.assertIsNotNone(m.next, "next is None on " + str(m))
         circle.curr.foreach(has_neighbors)
+
+    def test_counted(self):
+        circle = Circle.construct([0, 8, 4, 2, 5, 1, 6, 3, 7], 8)
+        self.assertEqual(9, circle.count)
+        self.assertEqual(len(circle.marbles()), Circle(circle.curr).count)
+        self.assertEqual(1, Circle().count)
     
     def test_remove_current(self):
         circle = Circle.construct([2, 5, 8], 5)
@@ -131,3 +183,66 @@ class TestGame(unittest.TestCase):
                 self.assertEqual(high_score, actual_high_score, "{} elves high score".format(nelves))
     
 
+
+class TestArrayGame(unittest.TestCase):
+
+    def test_construct(self):
+        circle = ArrayCircle.construct([0, 8, 4,  2,  5,  1,  6,  3,  7], 8)
+        expected = "0 (8) 4  2  5  1  6  3  7"
+        self.assertListEqual(expected.split(), circle.rendering().split())
+        self.assertEqual(9, circle.count)
+
+    def test_add_remove(self):
+        circle = ArrayCircle()
+        circle.add(1)
+        circle.add(2)
+        self.assertListEqual("0 (2) 1".split(), circle.rendering().split())
+        circle.remove(2)
+        self.assertListEqual("0 (1)".split(), circle.rendering().split())
+        self.assertEqual(2, circle.count)
+
+    def test_step_money(self):
+        values = list(map(int, "0 16  8 17  4 18  9 19  2 20 10 21  5 22 11  1 12  6 13  3 14  7 15".split()))
+        game = ArrayGame(ArrayCircle.construct(values, 22), 22)
+        player = Player(5)
+        game.step(player)
+        expected = "0 16  8 17  4 18 (19) 2 20 10 21  5 22 11  1 12  6 13  3 14  7 15".split()
+        self.assertListEqual(expected, game.circle.rendering().split())
+        self.assertEqual(32, player.score())
+
+    def test_matches_linked(self):
+        for nelves, last_marble_n in ((9, 25), (10, 1618), (13, 7999), (17, 1104)):
+            with self.subTest(nelves=nelves):
+                linked_players = [Player(i + 1) for i in range(nelves)]
+                array_players = [Player(i + 1) for i in range(nelves)]
+                linked_game, array_game = Game(), ArrayGame()
+                linked = linked_game.play(linked_players, last_marble_n)
+                fast = array_game.play(array_players, last_marble_n)
+                self.assertEqual((linked.tag, linked.score()), (fast.tag, fast.score()))
+                self.assertEqual(linked_game.circle.rendering(), array_game.circle.rendering())
+
+
+class TestBatchedGame(unittest.TestCase):
+
+    def test_play(self):
+        game = BatchedGame(9)
+        self.assertEqual(32, game.play(25)[1])
+        expected = "0 16  8 17  4 18 19  2 24 20 (25) 10 21  5 22 11  1 12  6 13  3 14  7 15"
+        self.assertListEqual(expected.split(), game.rendering().split())
+
+    def test_matches_linked(self):
+        for nelves, last_marble_n in ((9, 25), (10, 1618), (13, 7999), (17, 1104), (21, 6111), (30, 5807), (5, 30)):
+            with self.subTest(nelves=nelves, last_marble_n=last_marble_n):
+                players = [Player(i + 1) for i in range(nelves)]
+                linked_game = Game()
+                linked = linked_game.play(players, last_marble_n)
+                batched_game = BatchedGame(nelves)
+                position, high_score = batched_game.play(last_marble_n)
+                self.assertEqual(linked.score(), high_score)
+                self.assertEqual([p.score() for p in players], list(batched_game.scores))
+                self.assertEqual(linked_game.circle.rendering(), batched_game.rendering())
+
+    def test_callback_per_round(self):
+        rounds = []
+        BatchedGame(9).play(100, lambda value, scores, circle: rounds.append(value))
+        self.assertEqual([23, 46, 69, 92], rounds)